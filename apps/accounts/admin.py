@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import UserProfile, Notification
+from .models import UserProfile, Notification, NotificationArchive
 
 
 class UserProfileInline(admin.StackedInline):
@@ -67,6 +67,14 @@ class NotificationAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
 
 
+@admin.register(NotificationArchive)
+class NotificationArchiveAdmin(admin.ModelAdmin):
+    list_display = ('title', 'user', 'notification_type', 'created_at', 'archived_at')
+    list_filter = ('notification_type', 'created_at')
+    search_fields = ('title', 'user__username', 'user__email')
+    readonly_fields = ('created_at', 'archived_at')
+
+
 # Re-register UserAdmin
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
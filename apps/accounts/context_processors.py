@@ -0,0 +1,9 @@
+from .counters import unread_notification_count
+
+
+def notifications(request):
+    """Unread notification count for the navbar badge, served from the cache"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'unread_count': unread_notification_count(user.pk)}
@@ -0,0 +1,88 @@
+"""
+Cached counts shared across requests.
+
+Values live in the default cache (see CACHES), which every worker process
+shares, and are dropped by the signals in signals.py when the rows they
+count change.
+
+Unread notification counts are pushed rather than recomputed: creating
+notifications increments the cached value with cache.incr(), and reading
+them resets it. The file and database cache backends implement incr() as
+a read followed by a write, so with those a new notification drops the
+cached value instead and the next read recounts it from the database. A
+notification is unread while its is_read flag is unset and it is newer
+than the user's NotificationReadMark.
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+from .models import Notification, NotificationReadMark
+
+ACTIVE_DOCTOR_COUNT_KEY = 'accounts:active_doctor_count'
+ACTIVE_DOCTOR_COUNT_TIMEOUT = 300
+
+UNREAD_COUNT_KEY = 'accounts:unread_notifications:{user_id}'
+UNREAD_COUNT_TIMEOUT = 3600
+
+
+def active_doctor_count():
+    """Number of active doctor accounts"""
+    count = cache.get(ACTIVE_DOCTOR_COUNT_KEY)
+    if count is None:
+        count = User.objects.filter(userprofile__role='doctor', is_active=True).count()
+        cache.set(ACTIVE_DOCTOR_COUNT_KEY, count, ACTIVE_DOCTOR_COUNT_TIMEOUT)
+    return count
+
+
+def invalidate_active_doctor_count():
+    cache.delete(ACTIVE_DOCTOR_COUNT_KEY)
+
+
+def _unread_key(user_id):
+    return UNREAD_COUNT_KEY.format(user_id=user_id)
+
+
+def unread_notifications(user_id):
+    """Notifications neither marked read nor covered by the user's read mark"""
+    notifications = Notification.objects.filter(user_id=user_id, is_read=False)
+    read_through = NotificationReadMark.for_user(user_id)
+    if read_through is not None:
+        notifications = notifications.filter(created_at__gt=read_through)
+    return notifications
+
+
+def unread_notification_count(user_id):
+    """Number of unread notifications for a user"""
+    key = _unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = unread_notifications(user_id).count()
+        cache.add(key, count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def increment_unread_notifications(user_ids):
+    """Count one new notification for each entry in `user_ids` (repeats allowed)"""
+    counts = {}
+    for user_id in user_ids:
+        counts[user_id] = counts.get(user_id, 0) + 1
+    if isinstance(caches['default'], (FileBasedCache, DatabaseCache)):
+        # Two processes incrementing at once could lose a count; recount instead
+        cache.delete_many([_unread_key(user_id) for user_id in counts])
+        return
+    for user_id, count in counts.items():
+        try:
+            cache.incr(_unread_key(user_id), count)
+        except ValueError:
+            # Not cached; the next read counts from the database
+            pass
+
+
+def reset_unread_notifications(user_id, count=None):
+    """Store a known unread count, or forget it so the next read recounts"""
+    if count is None:
+        cache.delete(_unread_key(user_id))
+    else:
+        cache.set(_unread_key(user_id), count, UNREAD_COUNT_TIMEOUT)
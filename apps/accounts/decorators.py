@@ -1,6 +1,7 @@
 from django.shortcuts import redirect
 from django.contrib import messages
 from functools import wraps
+from .profiles import profile_for
 
 def role_required(allowed_roles=[]):
     """
@@ -14,14 +15,14 @@ def role_required(allowed_roles=[]):
                 messages.error(request, 'Please login to access this page.')
                 return redirect('accounts:login')
             
-            try:
-                user_role = request.user.userprofile.role
-                if user_role not in allowed_roles:
-                    messages.error(request, 'You do not have permission to access this page.')
-                    return redirect('accounts:dashboard')
-            except:
+            # Shares the request's cached profile with the view
+            user_profile = profile_for(request.user)
+            if user_profile is None:
                 messages.error(request, 'Profile not found.')
                 return redirect('accounts:login')
+            if user_profile.role not in allowed_roles:
+                messages.error(request, 'You do not have permission to access this page.')
+                return redirect('accounts:dashboard')
             
             return view_func(request, *args, **kwargs)
         return wrapper
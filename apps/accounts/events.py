@@ -0,0 +1,343 @@
+"""
+Live notification events.
+
+New notifications are published to a broker keyed by user id, and a
+server-sent events stream subscribes to it for each connected browser.
+Subscribers are asyncio queues, so an idle connection costs a queue and a
+suspended coroutine rather than a thread.
+
+The stream is served by NotificationStreamApp, a plain ASGI app that
+config/asgi.py mounts in front of Django at STREAM_PATH. It bypasses
+Django's request handler on purpose: that handler gives every request its
+own executor thread for sync code, which a long-lived stream would keep
+alive. Under WSGI (e.g. runserver) the view of the same URL answers with
+a one-shot snapshot instead and the browser reconnects periodically.
+
+The broker is chosen with the NOTIFICATION_EVENT_BROKER setting:
+
+* DatabaseBroker (the default) polls the notifications table from one
+  background thread per process every NOTIFICATION_EVENT_POLL_INTERVAL
+  seconds, so notifications stored by any process, including cron
+  commands such as send_appointment_reminders, reach every worker's
+  connections. One query per interval serves all of a process's streams.
+* InProcessBroker delivers published events immediately but only to
+  clients connected to the publishing process. It suits a single worker.
+
+A broker on shared infrastructure (e.g. Redis pub/sub) can replace either
+by implementing the same two methods.
+"""
+import asyncio
+import json
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from http.cookies import SimpleCookie
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.db.models import Max
+from django.http import HttpRequest
+from django.utils.module_loading import import_string
+
+from .counters import unread_notification_count
+from .models import Notification
+
+DEFAULT_BROKER = 'apps.accounts.events.DatabaseBroker'
+DEFAULT_POLL_INTERVAL = 2
+
+# Events kept for a subscriber that is not reading; beyond this they are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+STREAM_PATH = '/accounts/notifications/stream/'
+
+# Seconds between keep-alive comments on an idle stream
+STREAM_HEARTBEAT = 25
+
+# Notifications replayed to a client reconnecting with Last-Event-ID
+STREAM_REPLAY_LIMIT = 50
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Broker:
+    """Interface for publishing events to a user's live connections"""
+
+    def publish(self, user_id, event):
+        """Deliver `event` (a JSON-serializable dict) to the user's subscribers; callable from any thread"""
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        """Async context manager yielding an asyncio.Queue of the user's events"""
+        raise NotImplementedError
+
+
+class InProcessBroker(Broker):
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                # The subscriber's event loop has closed
+                pass
+
+    @staticmethod
+    def _offer(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(SUBSCRIBER_QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(user_id)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._subscribers[user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+class DatabaseBroker(InProcessBroker):
+    """
+    Finds new notifications by polling the table, whichever process stored them.
+
+    The poller remembers the highest notification id it has seen and each
+    round fetches the newer ones belonging to users with a live connection
+    here. The starting id is read when the first client subscribes, so
+    nothing stored while that client connects is missed; the poller then
+    idles without queries while nobody is connected.
+    """
+
+    def __init__(self, interval=None):
+        super().__init__()
+        self.interval = interval or getattr(settings, 'NOTIFICATION_EVENT_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        self._last_id = None
+        self._poller = None
+
+    def publish(self, user_id, event):
+        # Nothing to do: the poller picks the notification up from the database
+        pass
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        if self._last_id is None:
+            latest = await sync_to_async(self._latest_id, thread_sensitive=False)()
+            with self._lock:
+                if self._last_id is None:
+                    self._last_id = latest
+        self._ensure_poller()
+        async with super().subscribe(user_id) as queue:
+            yield queue
+
+    def _ensure_poller(self):
+        with self._lock:
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._run, name='notification-events', daemon=True)
+                self._poller.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except Exception as e:
+                sys.stderr.write(f'Could not poll for notification events: {e}\n')
+            finally:
+                close_old_connections()
+
+    @staticmethod
+    def _latest_id():
+        try:
+            return Notification.objects.aggregate(latest=Max('id'))['latest'] or 0
+        finally:
+            close_old_connections()
+
+    def poll(self):
+        """Deliver notifications stored since the previous poll to this process's subscribers"""
+        with self._lock:
+            user_ids = list(self._subscribers)
+        if not user_ids:
+            return
+
+        latest = Notification.objects.aggregate(latest=Max('id'))['latest'] or 0
+        if latest > self._last_id:
+            new = Notification.objects.filter(
+                id__gt=self._last_id, id__lte=latest, user_id__in=user_ids
+            ).order_by('id')
+            for notification in new:
+                super().publish(notification.user_id, notification_event(notification))
+        self._last_id = latest
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'NOTIFICATION_EVENT_BROKER', DEFAULT_BROKER))()
+    return _broker
+
+
+def notification_event(notification):
+    return {
+        'id': notification.pk,
+        'title': notification.title,
+        'message': notification.message,
+        'notification_type': notification.notification_type,
+        'created_at': notification.created_at.isoformat() if notification.created_at else None,
+    }
+
+
+def publish_notifications(notifications):
+    """Push newly stored notifications to their users' live connections"""
+    broker = get_broker()
+    for notification in notifications:
+        broker.publish(notification.user_id, notification_event(notification))
+
+
+def sse(data, event=None, event_id=None):
+    """One server-sent event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def catch_up(user_id, last_event_id=None, replayed=None):
+    """
+    Events for notifications missed since `last_event_id`, then the current
+    unread count. The ids of replayed notifications are added to `replayed`.
+    """
+    chunks = []
+    if last_event_id and last_event_id.isdigit():
+        missed = Notification.objects.filter(user_id=user_id, id__gt=int(last_event_id)).order_by('id')
+        for notification in missed[:STREAM_REPLAY_LIMIT]:
+            chunks.append(sse(notification_event(notification), 'notification', notification.pk))
+            if replayed is not None:
+                replayed.add(notification.pk)
+    chunks.append(sse({'count': unread_notification_count(user_id)}, 'unread'))
+    return chunks
+
+
+def _authenticated_user_id(cookie_header):
+    """User id behind a session cookie, checked the way AuthenticationMiddleware does"""
+    cookies = SimpleCookie()
+    cookies.load(cookie_header)
+    session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+    if session_key is None:
+        return None
+    try:
+        request = HttpRequest()
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore(session_key.value)
+        user = get_user(request)
+        return user.pk if user.is_authenticated else None
+    finally:
+        close_old_connections()
+
+
+def _catch_up(user_id, last_event_id, replayed):
+    try:
+        return catch_up(user_id, last_event_id, replayed)
+    finally:
+        close_old_connections()
+
+
+class NotificationStreamApp:
+    """ASGI app streaming a signed-in user's notification events"""
+
+    def __init__(self, heartbeat=STREAM_HEARTBEAT):
+        self.heartbeat = heartbeat
+
+    async def __call__(self, scope, receive, send):
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        # Run the few sync DB calls on the shared pool, not a thread per connection
+        user_id = await sync_to_async(_authenticated_user_id, thread_sensitive=False)(headers.get('cookie', ''))
+        if user_id is None:
+            await send({'type': 'http.response.start', 'status': 403, 'headers': [(b'content-type', b'text/plain')]})
+            await send({'type': 'http.response.body', 'body': b'Authentication required'})
+            return
+
+        disconnected = asyncio.ensure_future(self._wait_for_disconnect(receive))
+        try:
+            # Subscribe before catching up so nothing created meanwhile is missed
+            async with get_broker().subscribe(user_id) as queue:
+                await send({
+                    'type': 'http.response.start',
+                    'status': 200,
+                    'headers': [
+                        (b'content-type', b'text/event-stream'),
+                        (b'cache-control', b'no-cache'),
+                        (b'x-accel-buffering', b'no'),
+                    ],
+                })
+                replayed = set()
+                chunks = ['retry: 5000\n\n'] + await sync_to_async(_catch_up, thread_sensitive=False)(
+                    user_id, headers.get('last-event-id'), replayed
+                )
+                await self._send_text(send, ''.join(chunks))
+
+                while not disconnected.done():
+                    next_event = asyncio.ensure_future(queue.get())
+                    done, _ = await asyncio.wait(
+                        {next_event, disconnected}, timeout=self.heartbeat, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if next_event in done:
+                        event = next_event.result()
+                        # The broker may also deliver something the catch-up just replayed
+                        if event['id'] not in replayed:
+                            await self._send_text(send, sse(event, 'notification', event['id']))
+                    else:
+                        next_event.cancel()
+                        if not done:
+                            await self._send_text(send, ': keep-alive\n\n')
+        except OSError:
+            # The client went away mid-write
+            pass
+        finally:
+            disconnected.cancel()
+
+    @staticmethod
+    async def _send_text(send, text):
+        await send({'type': 'http.response.body', 'body': text.encode('utf-8'), 'more_body': True})
+
+    @staticmethod
+    async def _wait_for_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+
+def with_notification_stream(application, path=STREAM_PATH):
+    """Wrap an ASGI application so requests for `path` go to NotificationStreamApp"""
+    stream = NotificationStreamApp()
+
+    async def router(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == path:
+            await stream(scope, receive, send)
+        else:
+            await application(scope, receive, send)
+
+    return router
@@ -0,0 +1,114 @@
+"""
+Profile picture pipeline.
+
+UserProfile.save() schedules process_profile_picture() when the uploaded
+picture changes. The job runs on a small thread pool after the saving
+transaction commits, so the request never waits on image decoding.
+
+The original upload is decoded once: JPEGs are asked for a reduced-scale
+decode with Image.draft() and the result is shrunk with Image.reduce()
+before a final resample for each size. Every size is stored under a name
+derived from the hash of the original file's bytes, so a stored variant
+never changes and can be served with a far-future Cache-Control header.
+"""
+import hashlib
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+# Longest side in pixels for each stored variant, largest first
+PROFILE_PICTURE_SIZES = {
+    'avatar': 300,
+    'thumbnail': 96,
+}
+
+VARIANT_DIR = 'profile_pics/variants'
+
+JPEG_QUALITY = 85
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'PROFILE_PICTURE_WORKERS', 2),
+            thread_name_prefix='profile-pictures',
+        )
+    return _executor
+
+
+def variant_name(digest, size_name):
+    return f'{VARIANT_DIR}/{digest[:2]}/{digest}-{size_name}.jpg'
+
+
+def _downscale(image, size):
+    """Shrink `image` to fit in a size x size box, cheaply first and then with a proper filter"""
+    factor = min(image.width, image.height) // (size * 2)
+    if factor >= 2:
+        # Integer box reduction is much cheaper than resampling from full size
+        image = image.reduce(factor)
+    image = image.copy()
+    image.thumbnail((size, size), Image.Resampling.LANCZOS)
+    return image
+
+
+def render_variants(data, sizes=None):
+    """Decode `data` once and return {size_name: jpeg bytes} for each size"""
+    sizes = sizes or PROFILE_PICTURE_SIZES
+    largest = max(sizes.values())
+    image = Image.open(io.BytesIO(data))
+    # Only JPEG honours draft(); it decodes at 1/2, 1/4 or 1/8 scale directly
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image).convert('RGB')
+
+    variants = {}
+    for size_name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        # Each size starts from the previous, already smaller one
+        image = _downscale(image, size)
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        variants[size_name] = output.getvalue()
+    return variants
+
+
+def process_profile_picture(profile_id, picture_name):
+    """Store the sized variants of a profile's picture and point the profile at them"""
+    from .models import UserProfile
+
+    with default_storage.open(picture_name, 'rb') as picture:
+        data = picture.read()
+    digest = hashlib.sha256(data).hexdigest()
+
+    names = {size_name: variant_name(digest, size_name) for size_name in PROFILE_PICTURE_SIZES}
+    if not all(default_storage.exists(name) for name in names.values()):
+        for size_name, content in render_variants(data).items():
+            if not default_storage.exists(names[size_name]):
+                default_storage.save(names[size_name], ContentFile(content))
+
+    # Skip the update if the picture was replaced while this job ran
+    UserProfile.objects.filter(pk=profile_id, profile_picture=picture_name).update(
+        profile_avatar=names['avatar'],
+        profile_thumbnail=names['thumbnail'],
+    )
+
+
+def _run(profile_id, picture_name):
+    try:
+        process_profile_picture(profile_id, picture_name)
+    except Exception as e:
+        sys.stderr.write(f'Could not process profile picture {picture_name}: {e}\n')
+    finally:
+        close_old_connections()
+
+
+def schedule_profile_picture(profile_id, picture_name):
+    """Process the picture in the background once the current transaction commits"""
+    transaction.on_commit(lambda: _get_executor().submit(_run, profile_id, picture_name))
@@ -0,0 +1,118 @@
+import gzip
+import json
+import os
+import time as clock
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from apps.accounts.models import Notification, NotificationArchive
+
+ARCHIVE_FIELDS = ('id', 'user_id', 'title', 'message', 'notification_type', 'created_at')
+
+
+class Command(BaseCommand):
+    help = 'Move read notifications older than a cut-off into the archive table or a gzipped JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90),
+            help='Archive read notifications older than this many days'
+        )
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows moved per transaction')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between chunks')
+        parser.add_argument('--jsonl', help='Append to this .jsonl.gz file instead of the archive table')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--days and --chunk-size must be positive')
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # Read means flagged read, or covered by the user's read mark
+        candidates = Notification.objects.filter(created_at__lt=cutoff).filter(
+            Q(is_read=True) | Q(created_at__lte=F('user__notification_read_mark__read_through'))
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f'{candidates.count()} notifications older than {cutoff:%Y-%m-%d} would be archived.')
+            return
+
+        archive_file = open(options['jsonl'], 'ab') if options['jsonl'] else None
+        pending_path = f"{options['jsonl']}.pending" if archive_file else None
+        if pending_path and os.path.exists(pending_path):
+            self.finish_pending(pending_path)
+        moved = 0
+        last_id = 0
+        started = clock.monotonic()
+        try:
+            while True:
+                # Keyset over ids keeps each chunk an index range scan
+                rows = list(
+                    candidates.filter(id__gt=last_id).order_by('id').values(*ARCHIVE_FIELDS)[:options['chunk_size']]
+                )
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+
+                ids = [row['id'] for row in rows]
+                if archive_file:
+                    # On disk before anything is deleted; the pending ids let the next run
+                    # finish a chunk whose delete failed instead of appending it again
+                    self.write_jsonl(archive_file, rows)
+                    self.write_pending(pending_path, ids)
+
+                # One short transaction per chunk so other writers are not locked out for long
+                with transaction.atomic():
+                    if not archive_file:
+                        NotificationArchive.objects.bulk_create(
+                            [NotificationArchive(**row) for row in rows], ignore_conflicts=True
+                        )
+                    Notification.objects.filter(id__in=ids).delete()
+                if pending_path:
+                    os.remove(pending_path)
+
+                moved += len(rows)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'  {moved} archived so far')
+                if options['pause']:
+                    clock.sleep(options['pause'])
+        finally:
+            if archive_file:
+                archive_file.close()
+
+        elapsed = clock.monotonic() - started
+        rate = moved / elapsed if elapsed else 0
+        target = options['jsonl'] or NotificationArchive._meta.db_table
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {moved} notifications older than {cutoff:%Y-%m-%d} to {target} '
+            f'in {elapsed:.2f}s ({rate:.0f} rows/sec).'
+        ))
+
+    @staticmethod
+    def write_jsonl(archive_file, rows):
+        """Append rows as one gzip member and force them to disk"""
+        lines = ''.join(json.dumps({**row, 'created_at': row['created_at'].isoformat()}) + '\n' for row in rows)
+        archive_file.write(gzip.compress(lines.encode('utf-8')))
+        archive_file.flush()
+        os.fsync(archive_file.fileno())
+
+    @staticmethod
+    def write_pending(pending_path, ids):
+        """Record the ids of a chunk that is in the file but not yet deleted"""
+        with open(pending_path, 'w') as pending_file:
+            json.dump(ids, pending_file)
+            pending_file.flush()
+            os.fsync(pending_file.fileno())
+
+    def finish_pending(self, pending_path):
+        """Delete a chunk an earlier run wrote to the file but failed to delete"""
+        with open(pending_path) as pending_file:
+            ids = json.load(pending_file)
+        with transaction.atomic():
+            deleted, _ = Notification.objects.filter(id__in=ids).delete()
+        os.remove(pending_path)
+        self.stdout.write(f'Finished deleting {deleted} notifications archived by an earlier run.')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from apps.accounts.images import process_profile_picture
+from apps.accounts.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Generate the avatar and thumbnail variants for profile pictures that have none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Also redo profiles that already have variants')
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        if not options['all']:
+            profiles = profiles.filter(profile_avatar='')
+
+        processed = failed = 0
+        for profile_id, picture_name in profiles.values_list('id', 'profile_picture').iterator():
+            try:
+                process_profile_picture(profile_id, picture_name)
+                processed += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'  {picture_name}: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} profile pictures ({failed} failed).'))
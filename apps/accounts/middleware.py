@@ -0,0 +1,17 @@
+from . import notifications
+
+
+class NotificationBufferMiddleware:
+    """Deliver the notifications a request creates in one batch once its response is ready"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with notifications.buffered() as buffer:
+            response = self.get_response(request)
+            # A failed request should not tell anyone about changes it did not make
+            if response.status_code >= 500:
+                buffer.discard()
+        return response
+
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_notification_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='profile_avatar',
+            field=models.ImageField(blank=True, editable=False, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='profile_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to=''),
+        ),
+    ]
@@ -1,7 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
-from PIL import Image
+
+from .images import schedule_profile_picture
 
 
 class UserProfile(models.Model):
@@ -23,6 +24,9 @@ class UserProfile(models.Model):
     date_of_birth = models.DateField(null=True, blank=True)
     address = models.TextField(blank=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    # Sized copies of profile_picture under content-hashed names, see images.py
+    profile_avatar = models.ImageField(blank=True, editable=False)
+    profile_thumbnail = models.ImageField(blank=True, editable=False)
     emergency_contact_name = models.CharField(max_length=100, blank=True)
     emergency_contact_phone = models.CharField(max_length=15, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -42,16 +46,44 @@ class UserProfile(models.Model):
     def get_absolute_url(self):
         return reverse('accounts:profile', kwargs={'pk': self.pk})
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_picture = instance.__dict__.get('profile_picture')
+        return instance
+    
+    @property
+    def avatar_url(self):
+        """URL of the avatar-sized picture, or the original until it has been processed"""
+        if self.profile_avatar:
+            return self.profile_avatar.url
+        return self.profile_picture.url if self.profile_picture else ''
+    
+    @property
+    def thumbnail_url(self):
+        if self.profile_thumbnail:
+            return self.profile_thumbnail.url
+        return self.avatar_url
+    
     def save(self, *args, **kwargs):
+        picture = self.profile_picture.name if self.profile_picture else ''
+        loaded = getattr(self, '_loaded_picture', None)
+        loaded = loaded.name if hasattr(loaded, 'name') else (loaded or '')
+        picture_changed = picture != loaded
+        if picture_changed:
+            # The old variants belong to the old picture
+            self.profile_avatar = ''
+            self.profile_thumbnail = ''
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'profile_avatar', 'profile_thumbnail'}
         super().save(*args, **kwargs)
+        # Saving stores a new upload and may rename it
+        picture = self.profile_picture.name if self.profile_picture else ''
+        self._loaded_picture = picture
         
-        # Resize profile picture
-        if self.profile_picture:
-            img = Image.open(self.profile_picture.path)
-            if img.height > 300 or img.width > 300:
-                output_size = (300, 300)
-                img.thumbnail(output_size)
-                img.save(self.profile_picture.path)
+        if picture_changed and picture:
+            schedule_profile_picture(self.pk, picture)
 
 
 class DoctorApplication(models.Model):
@@ -103,6 +135,45 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Serves the per-user, newest-first notification pages
+            models.Index(fields=['user', '-created_at', '-id'], name='notif_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
+
+
+class NotificationReadMark(models.Model):
+    """Everything a user was notified of up to read_through counts as read"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_read_mark')
+    read_through = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.user.username} read through {self.read_through}"
+    
+    @classmethod
+    def for_user(cls, user_id):
+        """The user's read mark, or None if they never opened their notifications"""
+        return cls.objects.filter(user_id=user_id).values_list('read_through', flat=True).first()
+
+
+class NotificationArchive(models.Model):
+    """Read notifications moved out of Notification by the archive_notifications command"""
+    # Keeps the original notification id
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notif_archive_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.title} - {self.user.username} (archived)"
@@ -0,0 +1,166 @@
+"""
+Notification service.
+
+Views call notify() instead of creating Notification rows themselves.
+Inside a request the notifications are collected in a per-request buffer
+(see NotificationBufferMiddleware) and handed to the configured backend
+in one batch when the response is ready, or earlier once the buffer holds
+NOTIFICATION_BUFFER_SIZE items. Outside a request, e.g. in management
+commands, notify() delivers straight away. Code that needs the rows
+written inside its own transaction calls deliver(), which skips the buffer.
+
+The backend is chosen with the NOTIFICATION_BACKEND setting:
+
+* DatabaseBackend (default): one bulk_create per batch, then the new rows
+  are published to live connections (see events.py).
+* ConsoleBackend: prints notifications instead of storing them, like
+  Django's console email backend.
+* LocalQueueBackend: hands batches to a background thread that writes
+  them to the database, standing in for an external queue.
+"""
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+from .counters import increment_unread_notifications
+from .events import publish_notifications
+from .models import Notification
+
+DEFAULT_BACKEND = 'apps.accounts.notifications.DatabaseBackend'
+DEFAULT_BUFFER_SIZE = 100
+
+_buffer = ContextVar('notification_buffer', default=None)
+_backend = None
+
+
+class DatabaseBackend:
+    def send(self, notifications):
+        Notification.objects.bulk_create(notifications, batch_size=500)
+        unread = [notification for notification in notifications if not notification.is_read]
+        increment_unread_notifications(notification.user_id for notification in unread)
+        transaction.on_commit(lambda: publish_notifications(unread))
+
+
+class ConsoleBackend:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send(self, notifications):
+        for notification in notifications:
+            self.stream.write(
+                f"[{notification.notification_type}] to user {notification.user_id}: "
+                f"{notification.title} - {notification.message}\n"
+            )
+        self.stream.flush()
+
+
+class LocalQueueBackend:
+    """In-process queue drained by a daemon thread into the database"""
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.database = DatabaseBackend()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def send(self, notifications):
+        self._ensure_worker()
+        self.queue.put(list(notifications))
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._drain, name='notification-queue', daemon=True)
+                self._worker.start()
+
+    def _drain(self):
+        while True:
+            batch = self.queue.get()
+            # Merge whatever else is waiting into the same insert
+            while len(batch) < 500:
+                try:
+                    batch.extend(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.database.send(batch)
+            except Exception as e:
+                sys.stderr.write(f'Dropped {len(batch)} notifications: {e}\n')
+            finally:
+                close_old_connections()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(getattr(settings, 'NOTIFICATION_BACKEND', DEFAULT_BACKEND))()
+    return _backend
+
+
+class NotificationBuffer:
+    def __init__(self, size=None):
+        self.size = size or getattr(settings, 'NOTIFICATION_BUFFER_SIZE', DEFAULT_BUFFER_SIZE)
+        self.pending = []
+
+    def add(self, notifications):
+        self.pending.extend(notifications)
+        if len(self.pending) >= self.size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            batch, self.pending = self.pending, []
+            get_backend().send(batch)
+
+    def discard(self):
+        self.pending = []
+
+
+@contextmanager
+def buffered():
+    """Collect notify() calls in the block and deliver them together at the end"""
+    buffer = NotificationBuffer()
+    token = _buffer.set(buffer)
+    try:
+        yield buffer
+    except BaseException:
+        buffer.discard()
+        raise
+    finally:
+        _buffer.reset(token)
+    buffer.flush()
+
+
+def build(user, title, message, notification_type='system'):
+    """An unsaved Notification; `user` may be a User or a user id"""
+    return Notification(
+        user_id=getattr(user, 'pk', user),
+        title=title,
+        message=message,
+        notification_type=notification_type,
+    )
+
+
+def deliver(notifications):
+    """Hand unsaved Notification instances to the backend now, bypassing any buffer"""
+    if notifications:
+        get_backend().send(list(notifications))
+
+
+def notify_many(notifications):
+    """Queue unsaved Notification instances for delivery"""
+    buffer = _buffer.get()
+    if buffer is not None:
+        buffer.add(notifications)
+    else:
+        deliver(notifications)
+
+
+def notify(user, title, message, notification_type='system'):
+    notify_many([build(user, title, message, notification_type)])
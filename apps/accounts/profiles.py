@@ -0,0 +1,29 @@
+"""
+Request-scoped access to the signed-in user's UserProfile.
+
+ProfileModelBackend loads the profile together with the user, and
+get_user_profile() reads it through the user instance's related-object
+cache, so the profile is fetched at most once per request however many
+views, decorators, templates or model methods ask for it.
+"""
+from django.http import Http404
+
+from .models import UserProfile
+
+
+def profile_for(user):
+    """The user's profile (cached on the user instance), or None"""
+    if not user.is_authenticated:
+        return None
+    try:
+        return user.userprofile
+    except UserProfile.DoesNotExist:
+        return None
+
+
+def get_user_profile(request):
+    """The signed-in user's profile; raises Http404 if they have none"""
+    profile = profile_for(request.user)
+    if profile is None:
+        raise Http404('No UserProfile matches the given query.')
+    return profile
@@ -0,0 +1,42 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .counters import increment_unread_notifications, invalidate_active_doctor_count, reset_unread_notifications
+from .events import publish_notifications
+from .models import Notification, UserProfile
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def profile_changed(sender, instance, **kwargs):
+    # Role changes move users in and out of the doctor count
+    invalidate_active_doctor_count()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login and cannot change the count
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_active_doctor_count()
+
+
+@receiver(post_save, sender=Notification)
+def notification_saved(sender, instance, created, raw=False, **kwargs):
+    # bulk_create sends no signal; the notification service counts those itself
+    if raw:
+        return
+    if created and not instance.is_read:
+        increment_unread_notifications([instance.user_id])
+        transaction.on_commit(lambda: publish_notifications([instance]))
+    elif not created:
+        reset_unread_notifications(instance.user_id)
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        reset_unread_notifications(instance.user_id)
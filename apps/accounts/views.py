@@ -4,12 +4,16 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView
 from django.contrib import messages
 from django.urls import reverse_lazy
+from django.http import HttpResponse
 from django.db.models import Count, Q
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 from django.contrib.auth.models import User
 from .forms import CustomUserCreationForm, UserProfileForm, DoctorProfileForm, AdminUserEditForm, AdminDoctorCreationForm
-from .models import UserProfile, Notification
+from .models import UserProfile, Notification, NotificationReadMark
+from .profiles import get_user_profile
+from .counters import reset_unread_notifications, unread_notification_count
+from . import events
 
 
 class CustomLoginView(LoginView):
@@ -47,7 +51,7 @@ def register_view(request):
 
 @login_required
 def dashboard_view(request):
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     # Redirect doctors to their specific dashboard
     if user_profile.role == 'doctor':
@@ -58,9 +62,10 @@ def dashboard_view(request):
         return redirect('appointments:mother_dashboard')
     
     # Get recent notifications
-    all_notifications = Notification.objects.filter(user=request.user)
-    notifications = all_notifications[:5]
-    unread_count = all_notifications.filter(is_read=False).count()
+    notifications = _flag_unread(
+        list(Notification.objects.filter(user=request.user)[:5]), NotificationReadMark.for_user(request.user.pk)
+    )
+    unread_count = unread_notification_count(request.user.pk)
     
     # Check if user is new (first login)
     is_new_user = request.user.last_login is None
@@ -100,7 +105,7 @@ def dashboard_view(request):
 
 @login_required
 def profile_view(request):
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     if request.method == 'POST':
         if user_profile.role == 'doctor':
@@ -124,23 +129,73 @@ def profile_view(request):
     })
 
 
+NOTIFICATIONS_PER_PAGE = 20
+
+
+def _flag_unread(notifications, read_through):
+    """Set `unread` on each notification relative to a read mark"""
+    for notification in notifications:
+        notification.unread = not notification.is_read and (read_through is None or notification.created_at > read_through)
+    return notifications
+
+
 @login_required
 def notifications_view(request):
     notifications = Notification.objects.filter(user=request.user)
+    read_through = NotificationReadMark.for_user(request.user.pk)
     
-    # Mark all as read when viewing
-    notifications.filter(is_read=False).update(is_read=True)
+    # Keyset pagination on (created_at, id), newest first
+    after = request.GET.get('after')
+    cursor = None
+    if after:
+        try:
+            created_at, pk = after.rsplit('_', 1)
+            cursor = (datetime.fromisoformat(created_at), int(pk))
+        except ValueError:
+            cursor = None
+    if cursor:
+        notifications = notifications.filter(
+            Q(created_at__lt=cursor[0]) | Q(created_at=cursor[0], id__lt=cursor[1])
+        )
+    rows = list(notifications.order_by('-created_at', '-id')[:NOTIFICATIONS_PER_PAGE + 1])
+    page = _flag_unread(rows[:NOTIFICATIONS_PER_PAGE], read_through)
+    next_cursor = f"{page[-1].created_at.isoformat()}_{page[-1].pk}" if len(rows) > NOTIFICATIONS_PER_PAGE else None
+    
+    # Viewing the newest page moves the read mark; no notification rows are written
+    if not cursor and page and (read_through is None or page[0].created_at > read_through):
+        if read_through is None:
+            NotificationReadMark.objects.update_or_create(user=request.user, defaults={'read_through': page[0].created_at})
+        else:
+            NotificationReadMark.objects.filter(user=request.user).update(read_through=page[0].created_at)
+        reset_unread_notifications(request.user.pk)
     
     return render(request, 'accounts/notifications.html', {
-        'notifications': notifications
+        'notifications': page,
+        'new_count': sum(1 for notification in page if notification.unread),
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
     })
 
 
+@login_required
+def notification_stream(request):
+    """
+    One-shot server-sent events for WSGI deployments; the browser reconnects
+    after the retry interval. Under ASGI, config/asgi.py routes this URL to
+    events.NotificationStreamApp, which keeps the connection open instead.
+    """
+    chunks = ['retry: 15000\n\n'] + events.catch_up(request.user.pk, request.headers.get('Last-Event-ID'))
+    response = HttpResponse(''.join(chunks), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
 @login_required
 def mark_notification_read(request, notification_id):
     notification = get_object_or_404(Notification, id=notification_id, user=request.user)
-    notification.is_read = True
-    notification.save()
+    if not notification.is_read:
+        notification.is_read = True
+        notification.save(update_fields=['is_read'])  # resets the cached unread count
     return redirect('accounts:notifications')
 
 
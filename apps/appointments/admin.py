@@ -45,7 +45,7 @@ class AppointmentAdmin(admin.ModelAdmin):
 
 @admin.register(AppointmentReminder)
 class AppointmentReminderAdmin(admin.ModelAdmin):
-    list_display = ('appointment', 'reminder_type', 'hours_before', 'is_sent', 'sent_at')
+    list_display = ('appointment', 'reminder_type', 'hours_before', 'remind_at', 'is_sent', 'sent_at')
     list_filter = ('reminder_type', 'is_sent', 'hours_before')
     search_fields = ('appointment__patient__first_name', 'appointment__patient__last_name')
-    readonly_fields = ('sent_at',)
+    readonly_fields = ('remind_at', 'sent_at')
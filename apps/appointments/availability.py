@@ -0,0 +1,232 @@
+"""
+In-memory slot availability for doctors.
+
+A doctor's day is split into SLOT_MINUTES slots starting at midnight and
+stored as an integer bitmap, so "is this slot free" and "which slots are
+free" are bit operations instead of one query per slot. An engine loads
+every availability window, booked appointment and slot hold it needs in
+three queries up front and answers all later questions from memory.
+Working hours come from the read-only schedule templates in schedule.py.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import Appointment, SlotHold, compute_end_time
+from .schedule import resolve_windows
+
+SLOT_MINUTES = 30
+
+# Appointments in these statuses occupy their slot
+ACTIVE_STATUSES = ('pending', 'approved')
+
+
+def span_mask(start, end):
+    """Bitmap of the slots that overlap [start, end)"""
+    start_minutes = start.hour * 60 + start.minute
+    end_minutes = end.hour * 60 + end.minute + (1 if end == time.max else 0)
+    first = start_minutes // SLOT_MINUTES
+    last = -(-end_minutes // SLOT_MINUTES)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def slots_needed(duration_minutes):
+    return max(1, -(-(duration_minutes or SLOT_MINUTES) // SLOT_MINUTES))
+
+
+def slot_time(index):
+    """Return the start time of a slot number"""
+    minutes = index * SLOT_MINUTES
+    return time(minutes // 60, minutes % 60)
+
+
+def window_mask(start_time, end_time):
+    """Bitmap of the slots that start inside [start_time, end_time)"""
+    start_minutes = start_time.hour * 60 + start_time.minute
+    end_minutes = end_time.hour * 60 + end_time.minute
+    # Round the window start up to the slot grid
+    first = -(-start_minutes // SLOT_MINUTES)
+    last = -(-end_minutes // SLOT_MINUTES)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def starts_in_past(date, start):
+    """True if a slot on `date` starting at `start` has already begun"""
+    return timezone.make_aware(datetime.combine(date, start)) < timezone.now()
+
+
+def iter_bits(mask):
+    """Yield the slot numbers set in a bitmap, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class AvailabilityEngine:
+    """
+    Availability for a set of doctors over a date range.
+
+    Usage:
+        engine = AvailabilityEngine([doctor.pk], date, date)
+        engine.free_slots(doctor.pk, date)
+    """
+
+    def __init__(self, doctor_ids, start_date, end_date, exclude_appointment_id=None, hold_owner_id=None):
+        self.doctor_ids = list(doctor_ids)
+        self.start_date = start_date
+        self.end_date = end_date
+
+        # {doctor_id: {day_of_week: [(start_time, end_time), ...]}}
+        self.windows = resolve_windows(self.doctor_ids)
+        # {doctor_id: {date: bitmap}}
+        self.booked = defaultdict(dict)
+        # {(doctor_id, date): sorted [(start, end), ...]}
+        self.intervals = defaultdict(list)
+        self._max_ends = {}
+
+        appointments = Appointment.objects.filter(
+            doctor_id__in=self.doctor_ids,
+            date__range=(start_date, end_date),
+            status__in=ACTIVE_STATUSES
+        )
+        if exclude_appointment_id:
+            appointments = appointments.exclude(pk=exclude_appointment_id)
+        for doctor_id, date, start, end in appointments.values_list('doctor_id', 'date', 'time', 'end_time'):
+            self.mark_booked(doctor_id, date, start, end)
+
+        # Slots held by other patients mid-booking count as taken
+        holds = SlotHold.objects.filter(
+            doctor_id__in=self.doctor_ids,
+            date__range=(start_date, end_date),
+            expires_at__gt=timezone.now()
+        )
+        if hold_owner_id:
+            holds = holds.exclude(holder_id=hold_owner_id)
+        for doctor_id, date, start, end in holds.values_list('doctor_id', 'date', 'time', 'end_time'):
+            self.mark_booked(doctor_id, date, start, end)
+
+    def day_windows(self, doctor_id, day_of_week):
+        return self.windows.get(doctor_id, {}).get(day_of_week, [])
+
+    def has_windows(self, doctor_id, day_of_week):
+        return bool(self.day_windows(doctor_id, day_of_week))
+
+    def mark_booked(self, doctor_id, date, start, end):
+        day = self.booked[doctor_id]
+        day[date] = day.get(date, 0) | span_mask(start, end)
+        intervals = self.intervals[(doctor_id, date)]
+        intervals.insert(bisect_left(intervals, (start, end)), (start, end))
+        self._max_ends.pop((doctor_id, date), None)
+
+    def open_mask(self, doctor_id, date):
+        """Slots the doctor works on this date, ignoring bookings"""
+        mask = 0
+        for start_time, end_time in self.day_windows(doctor_id, date.weekday()):
+            mask |= window_mask(start_time, end_time)
+        return mask
+
+    def free_mask(self, doctor_id, date):
+        return self.open_mask(doctor_id, date) & ~self.booked[doctor_id].get(date, 0)
+
+    def start_mask(self, doctor_id, date, duration_minutes=SLOT_MINUTES):
+        """Slots where an appointment of this length can start without a clash"""
+        free = self.free_mask(doctor_id, date)
+        mask = free
+        for offset in range(1, slots_needed(duration_minutes)):
+            mask &= free >> offset
+        return mask
+
+    def is_within_hours(self, doctor_id, date, value, end=None):
+        """True if [value, end) fits inside one of the doctor's windows for that day"""
+        end = end or value
+        return any(
+            start_time <= value < end_time and end <= end_time
+            for start_time, end_time in self.day_windows(doctor_id, date.weekday())
+        )
+
+    def conflicts(self, doctor_id, date, start, end):
+        """
+        True if [start, end) overlaps a booked appointment.
+
+        Intervals are kept sorted by start with a running maximum of their
+        ends, so the check is a single bisect rather than a scan of the day.
+        """
+        key = (doctor_id, date)
+        intervals = self.intervals.get(key)
+        if not intervals:
+            return False
+        max_ends = self._max_ends.get(key)
+        if max_ends is None:
+            max_ends = []
+            for _, interval_end in intervals:
+                max_ends.append(max(interval_end, max_ends[-1]) if max_ends else interval_end)
+            self._max_ends[key] = max_ends
+        # Every interval starting before `end` is a candidate; the latest
+        # finishing one decides whether any of them reaches past `start`
+        count = bisect_left(intervals, (end, time.min))
+        return count > 0 and max_ends[count - 1] > start
+
+    def is_booked(self, doctor_id, date, value, duration_minutes=SLOT_MINUTES):
+        return self.conflicts(doctor_id, date, value, compute_end_time(date, value, duration_minutes))
+
+    def free_slots(self, doctor_id, date, duration_minutes=SLOT_MINUTES):
+        """Start times of every free slot on a date that fits the duration"""
+        return [slot_time(index) for index in iter_bits(self.start_mask(doctor_id, date, duration_minutes))]
+
+    def next_free_slots(self, doctor_id, count, after=None, start_date=None, end_date=None, duration_minutes=SLOT_MINUTES):
+        """
+        The first `count` free (date, time) pairs within the engine's range,
+        or within [start_date, end_date] if given. Slots starting before
+        `after` (a naive datetime) are skipped.
+        """
+        results = []
+        date = start_date or self.start_date
+        end_date = end_date or self.end_date
+        while date <= end_date and len(results) < count:
+            mask = self.start_mask(doctor_id, date, duration_minutes)
+            if after is not None and date <= after.date():
+                if date < after.date():
+                    mask = 0
+                else:
+                    # Drop slots that start before `after`
+                    minutes = after.hour * 60 + after.minute
+                    first = -(-minutes // SLOT_MINUTES)
+                    mask &= ~((1 << first) - 1)
+            for index in iter_bits(mask):
+                results.append((date, slot_time(index)))
+                if len(results) >= count:
+                    break
+            date += timedelta(days=1)
+        return results
+
+
+def earliest_open_slots(doctor_ids, start_date, end_date, count, after=None, duration_minutes=SLOT_MINUTES,
+                        hold_owner_id=None):
+    """
+    The earliest `count` free slots across several doctors.
+
+    Returns (date, time, doctor_id) tuples ordered by date, time, then
+    doctor. Everything is answered from one AvailabilityEngine load, so the
+    cost is the same three queries however many doctors and days are searched.
+    """
+    engine = AvailabilityEngine(doctor_ids, start_date, end_date, hold_owner_id=hold_owner_id)
+    results = []
+    date = start_date
+    while date <= end_date and len(results) < count:
+        day_slots = []
+        for doctor_id in engine.doctor_ids:
+            for slot_date, slot in engine.next_free_slots(
+                doctor_id, count, after=after, start_date=date, end_date=date, duration_minutes=duration_minutes
+            ):
+                day_slots.append((slot_date, slot, doctor_id))
+        day_slots.sort()
+        results.extend(day_slots[:count - len(results)])
+        date += timedelta(days=1)
+    return results
@@ -0,0 +1,164 @@
+"""
+Race-free booking.
+
+A patient may hold a slot for HOLD_MINUTES while filling in the booking
+form, and the booking itself is claimed inside a transaction that first
+locks the doctor's row. Every claim for the same doctor is therefore
+serialized, the overlap check and the insert happen under that lock, and
+exactly one of several simultaneous claims on a slot wins.
+
+SQLite ignores select_for_update, so there claims are serialized with a
+per-(doctor, date) process lock instead, and the database runs its
+transactions in IMMEDIATE mode (see DATABASES in settings) so that
+separate worker processes also queue on the write lock rather than both
+reading before either writes.
+
+A hold is only granted for a future slot inside the doctor's working
+hours, using the same checks as the booking form, and a patient may hold
+at most SLOT_HOLD_MAX_PER_HOLDER slots at a time.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .availability import ACTIVE_STATUSES, AvailabilityEngine, starts_in_past
+from .models import Appointment, SlotHold, compute_end_time
+
+HOLD_MINUTES = 5
+DEFAULT_MAX_HOLDS = 3
+
+# (doctor_id, date) -> [lock, number of threads using it]
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+class SlotUnavailable(Exception):
+    """Raised when a slot is booked or held by someone else"""
+
+
+@contextmanager
+def _slot_lock(doctor_id, date):
+    """Process-local lock used where the database has no row locks"""
+    if connection.features.has_select_for_update:
+        yield
+        return
+    key = (doctor_id, date)
+    with _locks_guard:
+        entry = _locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        # Drop the lock once nobody holds or waits for it, so the dict stays small
+        with _locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _locks[key]
+
+
+def _overlapping(queryset, start, end):
+    return queryset.filter(time__lt=end, end_time__gt=start)
+
+
+def slot_taken(doctor_id, date, start, end, holder_id=None, exclude_appointment_id=None):
+    """
+    True if [start, end) overlaps an active appointment or someone else's
+    unexpired hold. Both lookups are served by the (doctor, date, ...) indexes.
+    """
+    appointments = _overlapping(
+        Appointment.objects.filter(doctor_id=doctor_id, date=date, status__in=ACTIVE_STATUSES),
+        start, end
+    )
+    if exclude_appointment_id:
+        appointments = appointments.exclude(pk=exclude_appointment_id)
+    if appointments.exists():
+        return True
+
+    holds = _overlapping(
+        SlotHold.objects.filter(doctor_id=doctor_id, date=date, expires_at__gt=timezone.now()),
+        start, end
+    )
+    if holder_id:
+        holds = holds.exclude(holder_id=holder_id)
+    return holds.exists()
+
+
+def _lock_doctor(doctor_id):
+    # Row lock on the doctor serializes every claim against their calendar
+    list(User.objects.select_for_update().filter(pk=doctor_id).values_list('pk', flat=True))
+
+
+def hold_slot(doctor_id, date, start, duration_minutes, holder):
+    """
+    Reserve a slot for `holder` for HOLD_MINUTES.
+    Returns the SlotHold, or raises SlotUnavailable.
+    """
+    end = compute_end_time(date, start, duration_minutes)
+    now = timezone.now()
+
+    if starts_in_past(date, start):
+        raise SlotUnavailable('Cannot hold a time slot in the past.')
+    engine = AvailabilityEngine([doctor_id], date, date, hold_owner_id=holder.pk)
+    if not engine.is_within_hours(doctor_id, date, start, end):
+        raise SlotUnavailable('The doctor is not available at this time.')
+
+    with _slot_lock(doctor_id, date):
+        with transaction.atomic():
+            _lock_doctor(doctor_id)
+            SlotHold.objects.filter(doctor_id=doctor_id, date=date, expires_at__lte=now).delete()
+
+            if slot_taken(doctor_id, date, start, end, holder_id=holder.pk):
+                raise SlotUnavailable('This time slot has just been taken. Please choose another time.')
+
+            # The hold on this doctor is replaced below, so only holds on other doctors count
+            active_holds = SlotHold.objects.filter(holder=holder, expires_at__gt=now).exclude(doctor_id=doctor_id)
+            if active_holds.count() >= getattr(settings, 'SLOT_HOLD_MAX_PER_HOLDER', DEFAULT_MAX_HOLDS):
+                raise SlotUnavailable('You are already holding too many time slots. Finish or wait for one to expire.')
+
+            # A patient keeps at most one hold per doctor
+            SlotHold.objects.filter(doctor_id=doctor_id, holder=holder).delete()
+            return SlotHold.objects.create(
+                doctor_id=doctor_id,
+                holder=holder,
+                date=date,
+                time=start,
+                end_time=end,
+                expires_at=now + timedelta(minutes=HOLD_MINUTES),
+            )
+
+
+def claim_slot(appointment):
+    """
+    Save `appointment` only if its slot is still free.
+
+    The overlap check and the save run under the doctor lock, so concurrent
+    claims on the same slot resolve to exactly one winner. The patient's own
+    hold on the doctor is released once the booking is made.
+    """
+    end = compute_end_time(appointment.date, appointment.time, appointment.duration_minutes)
+
+    with _slot_lock(appointment.doctor_id, appointment.date):
+        try:
+            with transaction.atomic():
+                _lock_doctor(appointment.doctor_id)
+
+                if slot_taken(
+                    appointment.doctor_id, appointment.date, appointment.time, end,
+                    holder_id=appointment.patient_id,
+                    exclude_appointment_id=appointment.pk
+                ):
+                    raise SlotUnavailable('This time slot has just been booked. Please choose another time.')
+
+                appointment.save()
+                SlotHold.objects.filter(doctor_id=appointment.doctor_id, holder_id=appointment.patient_id).delete()
+        except IntegrityError:
+            # The unique active-slot constraint is the last line of defence
+            raise SlotUnavailable('This time slot has just been booked. Please choose another time.')
+
+    return appointment
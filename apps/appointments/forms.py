@@ -1,7 +1,8 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.utils import timezone
-from .models import Appointment, DoctorAvailability
+from .models import Appointment, DoctorAvailability, compute_end_time
+from .availability import AvailabilityEngine, starts_in_past
 
 
 class AppointmentForm(forms.ModelForm):
@@ -50,94 +51,32 @@ class AppointmentForm(forms.ModelForm):
         date = cleaned_data.get('date')
         time = cleaned_data.get('time')
         doctor = cleaned_data.get('doctor')
+        duration = cleaned_data.get('duration_minutes') or 30
         
         if date and time and doctor:
             # Check if appointment is in the past
-            appointment_datetime = timezone.datetime.combine(date, time)
-            # Make the datetime timezone-aware
-            appointment_datetime = timezone.make_aware(appointment_datetime)
-            if appointment_datetime < timezone.now():
+            if starts_in_past(date, time):
                 raise forms.ValidationError("Cannot schedule appointments in the past.")
             
-            # Check if doctor is available at this time
+            # Resolve the doctor's hours and bookings for the day without writing anything
             day_of_week = date.weekday()
-            availability = DoctorAvailability.objects.filter(
-                doctor=doctor,
-                day_of_week=day_of_week,
-                start_time__lte=time,
-                end_time__gt=time,
-                is_active=True
-            ).exists()
+            engine = AvailabilityEngine(
+                [doctor.pk], date, date,
+                exclude_appointment_id=self.instance.pk if self.instance else None,
+                hold_owner_id=self.user.pk if self.user else None
+            )
             
-            # If no availability is set, create default availability (9 AM to 5 PM on weekdays)
-            if not availability and day_of_week < 5:  # Monday to Friday
-                from datetime import time as dt_time
-                # Create default availability for this doctor if none exists
-                if not DoctorAvailability.objects.filter(doctor=doctor, day_of_week=day_of_week).exists():
-                    DoctorAvailability.objects.create(
-                        doctor=doctor,
-                        day_of_week=day_of_week,
-                        start_time=dt_time(9, 0),
-                        end_time=dt_time(17, 0),
-                        is_active=True
-                    )
-                    # Check again after creating default availability
-                    availability = DoctorAvailability.objects.filter(
-                        doctor=doctor,
-                        day_of_week=day_of_week,
-                        start_time__lte=time,
-                        end_time__gt=time,
-                        is_active=True
-                    ).exists()
-            
-            if not availability:
+            end_time = compute_end_time(date, time, duration)
+            if not engine.is_within_hours(doctor.pk, date, time, end_time):
                 if day_of_week >= 5:  # Weekend
                     raise forms.ValidationError(f"Dr. {doctor.get_full_name()} is not available on weekends. Please select a weekday.")
                 else:
                     raise forms.ValidationError(f"Dr. {doctor.get_full_name()} is not available at this time. Available hours are 9:00 AM to 5:00 PM on weekdays.")
             
-            # Check for conflicting appointments (same doctor, date, time)
-            existing_appointment = Appointment.objects.filter(
-                doctor=doctor,
-                date=date,
-                time=time,
-                status__in=['pending', 'approved']  # Only check non-cancelled appointments
-            ).exclude(pk=self.instance.pk if self.instance else None).exists()
-            
-            if existing_appointment:
-                # Get available times for this doctor on this date
-                from datetime import time as dt_time, timedelta
-                available_times = []
-                doctor_availability = DoctorAvailability.objects.filter(
-                    doctor=doctor,
-                    day_of_week=day_of_week,
-                    is_active=True
-                ).first()
-                
-                if doctor_availability:
-                    # Generate time slots (30-minute intervals)
-                    current_time = doctor_availability.start_time
-                    end_time = doctor_availability.end_time
-                    
-                    while current_time < end_time:
-                        # Check if this time slot is available
-                        slot_taken = Appointment.objects.filter(
-                            doctor=doctor,
-                            date=date,
-                            time=current_time,
-                            status__in=['pending', 'approved']
-                        ).exists()
-                        
-                        if not slot_taken:
-                            available_times.append(current_time.strftime('%H:%M'))
-                        
-                        # Add 30 minutes
-                        current_datetime = timezone.datetime.combine(date, current_time)
-                        current_datetime += timedelta(minutes=30)
-                        current_time = current_datetime.time()
-                        
-                        if len(available_times) >= 5:  # Limit to first 5 available slots
-                            break
+            # Check for overlapping appointments (only pending/approved occupy a slot)
+            if engine.conflicts(doctor.pk, date, time, end_time):
+                # Suggest the first 5 start times on this date that fit the duration
+                available_times = [slot.strftime('%H:%M') for slot in engine.free_slots(doctor.pk, date, duration)[:5]]
                 
                 if available_times:
                     raise forms.ValidationError(f"This time slot is already booked with Dr. {doctor.get_full_name()}. Available times today: {', '.join(available_times)}")
@@ -150,7 +89,7 @@ class AppointmentForm(forms.ModelForm):
         appointment = super().save(commit=False)
         
         # Only set patient if not already set and user is provided
-        if not appointment.patient and self.user:
+        if not appointment.patient_id and self.user:
             appointment.patient = self.user
         
         # Set default values if not provided
@@ -0,0 +1,137 @@
+"""
+iCalendar (.ics) feeds of a user's appointments.
+
+Feed URLs carry a random per-user token (CalendarFeedToken) instead of a
+session, so calendar clients can poll them without logging in. The user
+can regenerate the token at any time, which stops the old URL working. The feed body is produced line by line
+from a values() iterator and streamed, and its ETag/Last-Modified come
+from a single aggregate over the same appointments so unchanged feeds are
+answered with 304 Not Modified.
+"""
+import secrets
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Appointment, CalendarFeedToken
+
+# How far back a feed reaches; everything after that is included
+FEED_HISTORY_DAYS = 90
+
+STATUS_MAP = {
+    'pending': 'TENTATIVE',
+    'approved': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+    'cancelled': 'CANCELLED',
+}
+
+
+def feed_token(user):
+    """The user's feed token, created on first use"""
+    feed, _ = CalendarFeedToken.objects.get_or_create(user=user, defaults={'token': secrets.token_urlsafe(32)})
+    return feed.token
+
+
+def regenerate_feed_token(user):
+    """Replace the user's feed token, revoking every URL built from the old one"""
+    feed, _ = CalendarFeedToken.objects.update_or_create(user=user, defaults={'token': secrets.token_urlsafe(32)})
+    return feed.token
+
+
+def user_from_token(token):
+    """The active user a feed token belongs to, or None"""
+    return User.objects.filter(
+        calendar_feed_token__token=token, is_active=True
+    ).select_related('userprofile').first()
+
+
+def feed_appointments(user):
+    role = getattr(getattr(user, 'userprofile', None), 'role', None)
+    if role == 'mother':
+        appointments = Appointment.objects.filter(patient=user)
+    elif role == 'doctor':
+        appointments = Appointment.objects.filter(doctor=user)
+    elif role == 'admin':
+        appointments = Appointment.objects.all()
+    else:
+        appointments = Appointment.objects.none()
+    since = timezone.localdate() - timedelta(days=FEED_HISTORY_DAYS)
+    return appointments.filter(date__gte=since)
+
+
+def feed_version(appointments):
+    """(row count, newest updated_at) — changes whenever the feed would"""
+    summary = appointments.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+    return summary['count'], summary['last_modified']
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Split content lines longer than 75 octets as RFC 5545 requires"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        chunk = encoded[:limit]
+        # Do not split a multi-byte character
+        while chunk and (encoded[len(chunk):len(chunk) + 1] or b'\x00')[0] & 0xC0 == 0x80:
+            chunk = chunk[:-1]
+        parts.append(chunk.decode('utf-8'))
+        encoded = encoded[len(chunk):]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _local(date, value):
+    return _utc(timezone.make_aware(datetime.combine(date, value)))
+
+
+def generate_feed(user, appointments):
+    """Yield the feed one content line at a time"""
+    yield _fold('BEGIN:VCALENDAR')
+    yield _fold('VERSION:2.0')
+    yield _fold('PRODID:-//Baby Moms Care Clinic//Appointments//EN')
+    yield _fold('CALSCALE:GREGORIAN')
+    yield _fold('METHOD:PUBLISH')
+    yield _fold(f'X-WR-CALNAME:{_escape("Baby Moms Care - " + (user.get_full_name() or user.username))}')
+
+    rows = appointments.order_by('date', 'time').values(
+        'id', 'date', 'time', 'end_time', 'status', 'appointment_type', 'reason', 'updated_at',
+        'patient_id', 'patient__first_name', 'patient__last_name',
+        'doctor__first_name', 'doctor__last_name',
+    )
+    types = dict(Appointment.APPOINTMENT_TYPES)
+    for row in rows.iterator(chunk_size=500):
+        doctor_name = f"{row['doctor__first_name']} {row['doctor__last_name']}".strip()
+        patient_name = f"{row['patient__first_name']} {row['patient__last_name']}".strip()
+        if row['patient_id'] == user.pk:
+            summary = f"{types.get(row['appointment_type'], 'Appointment')} with Dr. {doctor_name}"
+        else:
+            summary = f"{types.get(row['appointment_type'], 'Appointment')}: {patient_name}"
+
+        yield _fold('BEGIN:VEVENT')
+        yield _fold(f"UID:appointment-{row['id']}@babymomscare")
+        yield _fold(f"DTSTAMP:{_utc(row['updated_at'])}")
+        yield _fold(f"LAST-MODIFIED:{_utc(row['updated_at'])}")
+        yield _fold(f"DTSTART:{_local(row['date'], row['time'])}")
+        yield _fold(f"DTEND:{_local(row['date'], row['end_time'])}")
+        yield _fold(f"SUMMARY:{_escape(summary)}")
+        if row['reason']:
+            yield _fold(f"DESCRIPTION:{_escape(row['reason'])}")
+        yield _fold(f"STATUS:{STATUS_MAP.get(row['status'], 'TENTATIVE')}")
+        yield _fold('END:VEVENT')
+
+    yield _fold('END:VCALENDAR')
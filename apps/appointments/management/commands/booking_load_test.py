@@ -0,0 +1,82 @@
+import time as clock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import time, timedelta
+from threading import Event
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases
+from django.utils import timezone
+from apps.accounts.models import UserProfile
+from apps.appointments.booking import SlotUnavailable, claim_slot
+from apps.appointments.models import Appointment
+
+
+class Command(BaseCommand):
+    help = 'Fire many concurrent bookings at one slot in a test database and check that exactly one wins'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=200, help='Number of concurrent booking attempts')
+        parser.add_argument('--workers', type=int, default=32, help='Number of booking threads')
+
+    def handle(self, *args, **options):
+        # Run against a throwaway test database, never the configured one
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.run_load_test(options['bookings'], options['workers'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+    def run_load_test(self, bookings, workers):
+        doctor = User.objects.create_user(username='loadtest-doctor', first_name='Load', last_name='Test')
+        UserProfile.objects.create(user=doctor, role='doctor')
+        User.objects.bulk_create([User(username=f'loadtest-patient-{i}') for i in range(bookings)])
+        patient_ids = list(User.objects.exclude(pk=doctor.pk).values_list('id', flat=True))
+
+        slot_date = timezone.localdate() + timedelta(days=7)
+        slot_time = time(10, 0)
+        # Released once every attempt is queued, so the first threads start together
+        start = Event()
+
+        def attempt(patient_id):
+            try:
+                start.wait()
+                claim_slot(Appointment(
+                    patient_id=patient_id,
+                    doctor=doctor,
+                    date=slot_date,
+                    time=slot_time,
+                    reason='Load test',
+                ))
+                return 'won'
+            except SlotUnavailable:
+                return 'lost'
+            except Exception as e:
+                return f'error: {e}'
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(attempt, patient_id) for patient_id in patient_ids]
+            started = clock.perf_counter()
+            start.set()
+            outcomes = [future.result() for future in futures]
+        elapsed = clock.perf_counter() - started
+
+        won = outcomes.count('won')
+        lost = outcomes.count('lost')
+        errors = [outcome for outcome in outcomes if outcome not in ('won', 'lost')]
+        stored = Appointment.objects.filter(doctor=doctor, date=slot_date, time=slot_time).count()
+
+        self.stdout.write(
+            f'{bookings} attempts with {workers} threads in {elapsed:.2f}s '
+            f'({bookings / elapsed:.0f} bookings/s): {won} won, {lost} lost, {len(errors)} errors'
+        )
+        for error in sorted(set(errors)):
+            self.stdout.write(f'  {error}')
+
+        if won != 1 or stored != 1 or errors:
+            raise CommandError(f'Expected exactly one winning booking, got {won} (stored {stored}).')
+
+        self.stdout.write(self.style.SUCCESS('Exactly one booking won the slot.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from apps.appointments import stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized dashboard counters for doctors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctor', type=int, action='append', help='Only rebuild this doctor id (repeatable)')
+
+    def handle(self, *args, **options):
+        doctor_ids = options['doctor'] or list(
+            User.objects.filter(userprofile__role='doctor').values_list('id', flat=True)
+        )
+        stats.rebuild(doctor_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {len(doctor_ids)} doctors.'))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from apps.appointments import stats
+from apps.appointments.models import Appointment, DoctorStats
+
+
+def _doctor_count(**aggregate):
+    rows = Appointment.objects.filter(doctor=OuterRef('doctor')).order_by().values('doctor').annotate(**aggregate)
+    return Coalesce(Subquery(rows.values(*aggregate)), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Rebuild pending_count and total_patients for doctors whose stats have drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drifted doctors')
+
+    def handle(self, *args, **options):
+        drifted = list(
+            DoctorStats.objects.annotate(
+                actual_pending=_doctor_count(total=Count('id', filter=Q(status='pending'))),
+                actual_patients=_doctor_count(total=Count('patient', distinct=True)),
+            ).filter(
+                ~Q(pending_count=F('actual_pending')) | ~Q(total_patients=F('actual_patients'))
+            ).values_list('doctor_id', 'pending_count', 'actual_pending', 'total_patients', 'actual_patients')
+        )
+
+        for doctor_id, pending, actual_pending, patients, actual_patients in drifted:
+            self.stdout.write(
+                f'  doctor {doctor_id}: pending {pending} -> {actual_pending}, patients {patients} -> {actual_patients}'
+            )
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(drifted)} doctors have drifted stats.')
+            return
+
+        ids = [row[0] for row in drifted]
+        for start in range(0, len(ids), 500):
+            # Recounts from the appointment table, including the DoctorPatient rows
+            stats.rebuild(ids[start:start + 500])
+        self.stdout.write(self.style.SUCCESS(f'Reconciled stats for {len(drifted)} doctors.'))
@@ -0,0 +1,127 @@
+import time as clock
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from apps.accounts.counters import increment_unread_notifications
+from apps.accounts.models import Notification
+from apps.appointments.availability import ACTIVE_STATUSES
+from apps.appointments.models import AppointmentReminder
+
+REMINDER_FIELDS = (
+    'id', 'remind_at', 'reminder_type',
+    'appointment__date', 'appointment__time', 'appointment__status',
+    'appointment__patient_id', 'appointment__patient__email',
+    'appointment__doctor__first_name', 'appointment__doctor__last_name',
+)
+
+
+class Command(BaseCommand):
+    help = 'Send due appointment reminders in batches (use --loop to keep running)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for due reminders')
+        parser.add_argument('--interval', type=int, default=60, help='Seconds between polls with --loop')
+        parser.add_argument('--batch-size', type=int, default=500, help='Reminders handled per batch')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, skipped = self.tick(options['batch_size'])
+            if sent or skipped or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Sent {sent} reminders, skipped {skipped} for closed appointments.'))
+            if not options['loop']:
+                return
+            clock.sleep(options['interval'])
+
+    def tick(self, batch_size):
+        """Send everything due now, one keyset-paginated batch at a time"""
+        now = timezone.now()
+        sent = skipped = 0
+        cursor = None
+
+        while True:
+            due = AppointmentReminder.objects.filter(is_sent=False, remind_at__lte=now)
+            if cursor:
+                due = due.filter(Q(remind_at__gt=cursor[0]) | Q(remind_at=cursor[0], id__gt=cursor[1]))
+            batch = list(due.order_by('remind_at', 'id').values(*REMINDER_FIELDS)[:batch_size])
+            if not batch:
+                return sent, skipped
+
+            cursor = (batch[-1]['remind_at'], batch[-1]['id'])
+            batch_sent, batch_skipped = self.dispatch(batch, now)
+            sent += batch_sent
+            skipped += batch_skipped
+
+    def dispatch(self, batch, now):
+        deliver, close = [], []
+        for reminder in batch:
+            starts_at = timezone.make_aware(
+                timezone.datetime.combine(reminder['appointment__date'], reminder['appointment__time'])
+            )
+            # Cancelled, completed or already-started appointments are closed out unsent
+            if reminder['appointment__status'] not in ACTIVE_STATUSES or starts_at <= now:
+                close.append(reminder)
+            else:
+                deliver.append(reminder)
+
+        with transaction.atomic():
+            # Claim the batch first so a concurrent or restarted worker skips it
+            claimed = AppointmentReminder.objects.filter(id__in=[reminder['id'] for reminder in batch], is_sent=False)
+            if connection.features.has_select_for_update_skip_locked:
+                claimed = claimed.select_for_update(skip_locked=True)
+            claimed_ids = set(claimed.values_list('id', flat=True))
+            AppointmentReminder.objects.filter(id__in=claimed_ids).update(is_sent=True, sent_at=now)
+
+            deliver = [reminder for reminder in deliver if reminder['id'] in claimed_ids]
+            emails = [
+                reminder for reminder in deliver
+                if reminder['reminder_type'] == 'email' and reminder['appointment__patient__email']
+            ]
+            # Everything else becomes an in-app notification, committed with the
+            # claim. SMS has no gateway configured, so it falls back to this too.
+            email_ids = {reminder['id'] for reminder in emails}
+            notify = [reminder for reminder in deliver if reminder['id'] not in email_ids]
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=reminder['appointment__patient_id'],
+                    title='Appointment Reminder',
+                    message=self.reminder_message(reminder),
+                    notification_type='appointment',
+                )
+                for reminder in notify
+            ], batch_size=500)
+        increment_unread_notifications(reminder['appointment__patient_id'] for reminder in notify)
+
+        # Emails go out after the claim commits, over a single connection
+        if emails:
+            try:
+                with get_connection() as mail_connection:
+                    mail_connection.send_messages([
+                        EmailMessage(
+                            subject='Appointment Reminder',
+                            body=self.reminder_message(reminder),
+                            from_email=settings.DEFAULT_FROM_EMAIL,
+                            to=[reminder['appointment__patient__email']],
+                        )
+                        for reminder in emails
+                    ])
+            except Exception as e:
+                # Release the claim so the next tick retries these emails
+                AppointmentReminder.objects.filter(id__in=[reminder['id'] for reminder in emails]).update(
+                    is_sent=False, sent_at=None
+                )
+                self.stderr.write(f'Email delivery failed, will retry: {e}')
+                emails = []
+
+        skipped = sum(1 for reminder in close if reminder['id'] in claimed_ids)
+        return len(notify) + len(emails), skipped
+
+    def reminder_message(self, reminder):
+        doctor_name = f"{reminder['appointment__doctor__first_name']} {reminder['appointment__doctor__last_name']}".strip()
+        return (
+            f"Reminder: you have an appointment with Dr. {doctor_name} on "
+            f"{reminder['appointment__date']} at {reminder['appointment__time'].strftime('%I:%M %p')}."
+        )
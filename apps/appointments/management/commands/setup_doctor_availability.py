@@ -1,55 +1,49 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from apps.appointments.models import DoctorAvailability
-from apps.accounts.models import UserProfile
-from datetime import time
+from apps.appointments.schedule import DEFAULT_WEEKLY_TEMPLATE
 
 
 class Command(BaseCommand):
-    help = 'Setup default availability for all doctors'
+    help = 'Materialize the default weekly schedule as availability rows for all doctors'
 
     def handle(self, *args, **options):
         # Get all doctors
-        doctors = User.objects.filter(userprofile__role='doctor', is_active=True)
-        
-        if not doctors.exists():
+        doctor_ids = list(
+            User.objects.filter(userprofile__role='doctor', is_active=True).values_list('id', flat=True)
+        )
+
+        if not doctor_ids:
             self.stdout.write(
                 self.style.WARNING('No doctors found. Please create doctor accounts first.')
             )
             return
-        
-        # Default availability schedule (Monday to Friday, 9 AM to 5 PM)
-        default_schedule = [
-            (0, time(9, 0), time(17, 0)),  # Monday
-            (1, time(9, 0), time(17, 0)),  # Tuesday
-            (2, time(9, 0), time(17, 0)),  # Wednesday
-            (3, time(9, 0), time(17, 0)),  # Thursday
-            (4, time(9, 0), time(17, 0)),  # Friday
+
+        # Days a doctor has already configured keep their own rows
+        configured_days = set(
+            DoctorAvailability.objects.filter(doctor_id__in=doctor_ids).values_list('doctor_id', 'day_of_week')
+        )
+
+        rows = [
+            DoctorAvailability(
+                doctor_id=doctor_id,
+                day_of_week=day_of_week,
+                start_time=start_time,
+                end_time=end_time,
+                is_active=True
+            )
+            for doctor_id in doctor_ids
+            for day_of_week, windows in DEFAULT_WEEKLY_TEMPLATE.items()
+            if (doctor_id, day_of_week) not in configured_days
+            for start_time, end_time in windows
         ]
-        
-        created_count = 0
-        
-        for doctor in doctors:
-            for day_of_week, start_time, end_time in default_schedule:
-                availability, created = DoctorAvailability.objects.get_or_create(
-                    doctor=doctor,
-                    day_of_week=day_of_week,
-                    start_time=start_time,
-                    defaults={
-                        'end_time': end_time,
-                        'is_active': True
-                    }
-                )
-                
-                if created:
-                    created_count += 1
-                    self.stdout.write(
-                        f'Created availability for Dr. {doctor.get_full_name()} - '
-                        f'{availability.get_day_of_week_display()} {start_time}-{end_time}'
-                    )
-        
+
+        before = DoctorAvailability.objects.filter(doctor_id__in=doctor_ids).count()
+        DoctorAvailability.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+        created_count = DoctorAvailability.objects.filter(doctor_id__in=doctor_ids).count() - before
+
         self.stdout.write(
             self.style.SUCCESS(
-                f'Successfully created {created_count} availability slots for {doctors.count()} doctors.'
+                f'Successfully created {created_count} availability slots for {len(doctor_ids)} doctors.'
             )
         )
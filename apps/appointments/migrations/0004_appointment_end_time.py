@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:12
+
+from datetime import datetime, time, timedelta
+
+from django.db import migrations, models
+
+
+def backfill_end_time(apps, schema_editor):
+    Appointment = apps.get_model('appointments', 'Appointment')
+    appointments = Appointment.objects.filter(end_time__isnull=True).only('date', 'time', 'duration_minutes')
+    batch = []
+    for appointment in appointments.iterator(chunk_size=500):
+        start = datetime.combine(appointment.date, appointment.time)
+        end = start + timedelta(minutes=appointment.duration_minutes or 30)
+        appointment.end_time = end.time() if end.date() == start.date() else time.max
+        batch.append(appointment)
+        if len(batch) >= 500:
+            Appointment.objects.bulk_update(batch, ['end_time'])
+            batch = []
+    if batch:
+        Appointment.objects.bulk_update(batch, ['end_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_appointment_diagnosis_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='end_time',
+            field=models.TimeField(editable=False, help_text='Derived from time and duration_minutes', null=True),
+        ),
+        migrations.RunPython(backfill_end_time, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='appointment',
+            name='end_time',
+            field=models.TimeField(editable=False, help_text='Derived from time and duration_minutes'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'date', 'time', 'end_time'], name='appt_doctor_span_idx'),
+        ),
+    ]
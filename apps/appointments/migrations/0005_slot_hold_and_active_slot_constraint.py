@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_appointment_end_time'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='appointment',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'approved'])), fields=('doctor', 'date', 'time'), name='appt_unique_active_slot', violation_error_message='This time slot is already booked.'),
+        ),
+        migrations.AddField(
+            model_name='slothold',
+            name='doctor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='slothold',
+            name='holder',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='held_slots', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='slothold',
+            index=models.Index(fields=['doctor', 'date', 'expires_at'], name='slothold_doctor_date_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:21
+
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_remind_at(apps, schema_editor):
+    AppointmentReminder = apps.get_model('appointments', 'AppointmentReminder')
+    reminders = AppointmentReminder.objects.filter(remind_at__isnull=True).select_related('appointment')
+    batch = []
+    for reminder in reminders.iterator(chunk_size=500):
+        starts_at = timezone.make_aware(datetime.combine(reminder.appointment.date, reminder.appointment.time))
+        reminder.remind_at = starts_at - timedelta(hours=reminder.hours_before)
+        batch.append(reminder)
+        if len(batch) >= 500:
+            AppointmentReminder.objects.bulk_update(batch, ['remind_at'])
+            batch = []
+    if batch:
+        AppointmentReminder.objects.bulk_update(batch, ['remind_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_slot_hold_and_active_slot_constraint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointmentreminder',
+            name='remind_at',
+            field=models.DateTimeField(editable=False, help_text='Appointment start minus hours_before', null=True),
+        ),
+        migrations.RunPython(backfill_remind_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='appointmentreminder',
+            name='remind_at',
+            field=models.DateTimeField(editable=False, help_text='Appointment start minus hours_before'),
+        ),
+        migrations.AddIndex(
+            model_name='appointmentreminder',
+            index=models.Index(condition=models.Q(('is_sent', False)), fields=['remind_at', 'id'], name='reminder_due_idx'),
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_TABLE = 'appointments_search_fts'
+ENTRY_TABLE = 'appointments_appointmentsearchentry'
+
+
+def create_search_backend(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                # Without FTS5 search falls back to LIKE on the entries
+                return
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"patient_document, doctor_document, content='{ENTRY_TABLE}', "
+            f"content_rowid='appointment_id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        # External-content FTS tables are kept in step by triggers
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {ENTRY_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, patient_document, doctor_document) "
+            f"VALUES (new.appointment_id, new.patient_document, new.doctor_document); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {ENTRY_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, patient_document, doctor_document) "
+            f"VALUES ('delete', old.appointment_id, old.patient_document, old.doctor_document); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {ENTRY_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, patient_document, doctor_document) "
+            f"VALUES ('delete', old.appointment_id, old.patient_document, old.doctor_document); "
+            f"INSERT INTO {FTS_TABLE}(rowid, patient_document, doctor_document) "
+            f"VALUES (new.appointment_id, new.patient_document, new.doctor_document); END"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in ('patient_document', 'doctor_document'):
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS appt_search_{column}_trgm '
+                f'ON {ENTRY_TABLE} USING gin ({column} gin_trgm_ops)'
+            )
+
+
+def drop_search_backend(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        for column in ('patient_document', 'doctor_document'):
+            schema_editor.execute(f'DROP INDEX IF EXISTS appt_search_{column}_trgm')
+
+
+def backfill_search_entries(apps, schema_editor):
+    Appointment = apps.get_model('appointments', 'Appointment')
+    AppointmentSearchEntry = apps.get_model('appointments', 'AppointmentSearchEntry')
+
+    def document(first_name, last_name, reason):
+        return ' '.join(part for part in (first_name, last_name, reason) if part).lower()
+
+    rows = Appointment.objects.values_list(
+        'id', 'reason', 'patient__first_name', 'patient__last_name', 'doctor__first_name', 'doctor__last_name'
+    )
+    batch = []
+    for pk, reason, patient_first, patient_last, doctor_first, doctor_last in rows.iterator(chunk_size=1000):
+        batch.append(AppointmentSearchEntry(
+            appointment_id=pk,
+            patient_document=document(patient_first, patient_last, reason),
+            doctor_document=document(doctor_first, doctor_last, reason),
+        ))
+        if len(batch) >= 1000:
+            AppointmentSearchEntry.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        AppointmentSearchEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0007_doctor_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentSearchEntry',
+            fields=[
+                ('appointment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_entry', serialize=False, to='appointments.appointment')),
+                ('patient_document', models.TextField(blank=True)),
+                ('doctor_document', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Appointment search entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['-date', '-time', '-id'], name='appt_list_seek_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', '-date', '-time', '-id'], name='appt_patient_seek_idx'),
+        ),
+        migrations.RunPython(create_search_backend, drop_search_backend),
+        migrations.RunPython(backfill_search_entries, migrations.RunPython.noop),
+    ]
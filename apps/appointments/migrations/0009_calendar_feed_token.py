@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0008_appointment_search'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarFeedToken',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='calendar_feed_token', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('token', models.CharField(max_length=64, unique=True)),
+                ('issued_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -2,6 +2,16 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
+from datetime import datetime, time, timedelta
+
+
+def compute_end_time(date, start, duration_minutes):
+    """End of an appointment, clamped to the end of its day"""
+    start_datetime = datetime.combine(date, start)
+    end_datetime = start_datetime + timedelta(minutes=duration_minutes or 30)
+    if end_datetime.date() != start_datetime.date():
+        return time.max
+    return end_datetime.time()
 
 
 class DoctorAvailability(models.Model):
@@ -58,12 +68,28 @@ class Appointment(models.Model):
     prescription = models.TextField(blank=True, help_text="Prescribed medications")
     follow_up_instructions = models.TextField(blank=True, help_text="Follow-up care instructions")
     duration_minutes = models.PositiveIntegerField(default=30)
+    end_time = models.TimeField(editable=False, help_text="Derived from time and duration_minutes")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['date', 'time']
-        unique_together = ['doctor', 'date', 'time']
+        constraints = [
+            # Cancelled and completed appointments no longer hold their slot
+            models.UniqueConstraint(
+                fields=['doctor', 'date', 'time'],
+                condition=models.Q(status__in=['pending', 'approved']),
+                name='appt_unique_active_slot',
+                violation_error_message='This time slot is already booked.',
+            ),
+        ]
+        indexes = [
+            # Serves overlap lookups: time < new_end AND end_time > new_start
+            models.Index(fields=['doctor', 'date', 'time', 'end_time'], name='appt_doctor_span_idx'),
+            # Seek pagination of appointment lists, newest first
+            models.Index(fields=['-date', '-time', '-id'], name='appt_list_seek_idx'),
+            models.Index(fields=['patient', '-date', '-time', '-id'], name='appt_patient_seek_idx'),
+        ]
     
     def __str__(self):
         return f"{self.patient.get_full_name()} with Dr. {self.doctor.get_full_name()} on {self.date} at {self.time}"
@@ -71,10 +97,43 @@ class Appointment(models.Model):
     def get_absolute_url(self):
         return reverse('appointments:detail', kwargs={'pk': self.pk})
     
+    # Fields whose stored values are remembered, see loaded_state()
+    TRACKED_FIELDS = ('date', 'time', 'status', 'doctor_id', 'patient_id')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_state = {name: instance.__dict__.get(name) for name in cls.TRACKED_FIELDS}
+        return instance
+    
+    def loaded_state(self):
+        """Tracked field values as last loaded from or saved to the database, or None if unsaved"""
+        return getattr(self, '_loaded_state', None)
+    
+    def save(self, *args, **kwargs):
+        self.end_time = compute_end_time(self.date, self.time, self.duration_minutes)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'time', 'duration_minutes'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'end_time'}
+        loaded = self.loaded_state()
+        rescheduled = loaded is not None and (loaded['date'], loaded['time']) != (self.date, self.time)
+        super().save(*args, **kwargs)
+        self._loaded_state = {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+        
+        if rescheduled:
+            # Keep pending reminders in step with the new time
+            reminders = list(self.reminders.filter(is_sent=False))
+            for reminder in reminders:
+                reminder.remind_at = reminder.compute_remind_at(self)
+            AppointmentReminder.objects.bulk_update(reminders, ['remind_at'])
+    
+    @property
+    def starts_at(self):
+        return timezone.make_aware(datetime.combine(self.date, self.time))
+    
     @property
     def is_past(self):
-        appointment_datetime = timezone.datetime.combine(self.date, self.time)
-        return appointment_datetime < timezone.now()
+        return self.starts_at < timezone.now()
     
     @property
     def is_today(self):
@@ -91,6 +150,29 @@ class Appointment(models.Model):
         return self.date >= timezone.now().date() and self.status in ['pending', 'approved']
 
 
+class SlotHold(models.Model):
+    """Short-lived reservation of a slot while a patient completes booking"""
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='slot_holds')
+    holder = models.ForeignKey(User, on_delete=models.CASCADE, related_name='held_slots')
+    date = models.DateField()
+    time = models.TimeField()
+    end_time = models.TimeField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'date', 'expires_at'], name='slothold_doctor_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Hold on Dr. {self.doctor.get_full_name()} {self.date} {self.time} until {self.expires_at}"
+    
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+
 class AppointmentReminder(models.Model):
     REMINDER_TYPES = (
         ('email', 'Email'),
@@ -101,12 +183,79 @@ class AppointmentReminder(models.Model):
     appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='reminders')
     reminder_type = models.CharField(max_length=20, choices=REMINDER_TYPES)
     hours_before = models.PositiveIntegerField(default=24)
+    remind_at = models.DateTimeField(editable=False, help_text="Appointment start minus hours_before")
     is_sent = models.BooleanField(default=False)
     sent_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         unique_together = ['appointment', 'reminder_type', 'hours_before']
+        indexes = [
+            # Due reminders are a range scan over unsent rows only
+            models.Index(fields=['remind_at', 'id'], condition=models.Q(is_sent=False), name='reminder_due_idx'),
+        ]
     
     def __str__(self):
         return f"Reminder for {self.appointment} - {self.hours_before}h before"
+    
+    def compute_remind_at(self, appointment=None):
+        appointment = appointment or self.appointment
+        return appointment.starts_at - timedelta(hours=self.hours_before)
+    
+    def save(self, *args, **kwargs):
+        self.remind_at = self.compute_remind_at()
+        super().save(*args, **kwargs)
+
+
+class DoctorStats(models.Model):
+    """Dashboard counters for a doctor, kept current by appointment signals"""
+    doctor = models.OneToOneField(User, on_delete=models.CASCADE, related_name='doctor_stats')
+    pending_count = models.PositiveIntegerField(default=0)
+    total_patients = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'Doctor stats'
+    
+    def __str__(self):
+        return f"Stats for Dr. {self.doctor.get_full_name()}"
+
+
+class DoctorPatient(models.Model):
+    """How many appointments a patient has with a doctor; one row per distinct pair"""
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='doctor_patient_links')
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='patient_doctor_links')
+    appointment_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['doctor', 'patient']
+    
+    def __str__(self):
+        return f"{self.patient.get_full_name()} with Dr. {self.doctor.get_full_name()}"
+
+
+class AppointmentSearchEntry(models.Model):
+    """Denormalized, lowercased search text for one appointment, see search.py"""
+    appointment = models.OneToOneField(
+        Appointment, on_delete=models.CASCADE, primary_key=True, related_name='search_entry'
+    )
+    # Patient name plus reason, searched by doctors and admins
+    patient_document = models.TextField(blank=True)
+    # Doctor name plus reason, searched by mothers
+    doctor_document = models.TextField(blank=True)
+    
+    class Meta:
+        verbose_name_plural = 'Appointment search entries'
+    
+    def __str__(self):
+        return f"Search entry for appointment {self.appointment_id}"
+
+
+class CalendarFeedToken(models.Model):
+    """Secret in a user's calendar feed URL; regenerating it revokes the old URL"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='calendar_feed_token')
+    token = models.CharField(max_length=64, unique=True)
+    issued_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Calendar feed token for {self.user.username}"
@@ -0,0 +1,45 @@
+"""
+Weekly schedule templates for doctors.
+
+Every doctor works the default template (weekdays, 9 AM to 5 PM) unless
+they have stored DoctorAvailability rows for a day. Stored rows replace the
+template for that day only, and a day whose rows are all inactive is a day
+off. Resolution is read-only: nothing is written while checking
+availability, and `setup_doctor_availability` can materialize the template
+in bulk when rows are wanted in the database.
+"""
+from collections import defaultdict
+from datetime import time
+
+from .models import DoctorAvailability
+
+# {day_of_week: [(start_time, end_time), ...]}, Monday is 0
+DEFAULT_WEEKLY_TEMPLATE = {
+    day_of_week: [(time(9, 0), time(17, 0))]
+    for day_of_week in range(5)
+}
+
+
+def resolve_windows(doctor_ids, template=DEFAULT_WEEKLY_TEMPLATE):
+    """
+    Working windows for each doctor in one query.
+
+    Returns {doctor_id: {day_of_week: [(start_time, end_time), ...]}}.
+    """
+    stored = defaultdict(lambda: defaultdict(list))
+    rows = DoctorAvailability.objects.filter(
+        doctor_id__in=doctor_ids
+    ).values_list('doctor_id', 'day_of_week', 'start_time', 'end_time', 'is_active')
+    for doctor_id, day_of_week, start_time, end_time, is_active in rows:
+        windows = stored[doctor_id][day_of_week]
+        if is_active:
+            windows.append((start_time, end_time))
+
+    resolved = {}
+    for doctor_id in doctor_ids:
+        overrides = stored.get(doctor_id, {})
+        resolved[doctor_id] = {
+            day_of_week: overrides[day_of_week] if day_of_week in overrides else list(template.get(day_of_week, []))
+            for day_of_week in range(7)
+        }
+    return resolved
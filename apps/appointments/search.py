@@ -0,0 +1,106 @@
+"""
+Prebuilt search over appointment names and reasons.
+
+Each appointment has an AppointmentSearchEntry holding two lowercased
+documents: the patient's name with the reason, and the doctor's name with
+the reason. Entries are refreshed by signals when an appointment or a
+user's name changes, so a search never joins the user table.
+
+How an entry is matched depends on the database:
+
+* SQLite: an FTS5 table mirrors the entries through triggers (see
+  migration 0008) and queries are prefix matches on every word.
+* PostgreSQL: the documents carry pg_trgm GIN indexes, which serve the
+  LIKE '%term%' filter directly.
+* Anything else: the same LIKE filter, unindexed.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Appointment, AppointmentSearchEntry
+
+FTS_TABLE = 'appointments_search_fts'
+
+ENTRY_FIELDS = (
+    'id', 'reason',
+    'patient__first_name', 'patient__last_name',
+    'doctor__first_name', 'doctor__last_name',
+)
+
+_fts_available = None
+
+
+def _document(first_name, last_name, reason):
+    return ' '.join(part for part in (first_name, last_name, reason) if part).lower()
+
+
+def _entry(row):
+    return AppointmentSearchEntry(
+        appointment_id=row['id'],
+        patient_document=_document(row['patient__first_name'], row['patient__last_name'], row['reason']),
+        doctor_document=_document(row['doctor__first_name'], row['doctor__last_name'], row['reason']),
+    )
+
+
+def index_appointments(appointments):
+    """Create or refresh the search entries for a queryset of appointments"""
+    rows = appointments.order_by().values(*ENTRY_FIELDS)
+    batch = []
+    for row in rows.iterator(chunk_size=1000):
+        batch.append(_entry(row))
+        if len(batch) >= 1000:
+            _upsert(batch)
+            batch = []
+    if batch:
+        _upsert(batch)
+
+
+def _upsert(entries):
+    AppointmentSearchEntry.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=['appointment'],
+        update_fields=['patient_document', 'doctor_document'],
+    )
+
+
+def index_user(user_id):
+    """Refresh every entry that embeds this user's name"""
+    index_appointments(Appointment.objects.filter(Q(patient_id=user_id) | Q(doctor_id=user_id)))
+
+
+def fts_available():
+    """Whether the SQLite FTS5 mirror exists; checked once per process"""
+    global _fts_available
+    if connection.vendor != 'sqlite':
+        return False
+    if _fts_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_available = cursor.fetchone() is not None
+    return _fts_available
+
+
+def _fts_query(column, terms):
+    phrases = ' AND '.join('"%s"*' % term.replace('"', '""') for term in terms)
+    return f'{{{column}}} : ({phrases})'
+
+
+def search(appointments, query, document='patient_document'):
+    """
+    Narrow `appointments` to those whose `document` contains every word of
+    `query`, using the search entry index.
+    """
+    terms = re.findall(r'\w+', query.lower())
+    if not terms:
+        return appointments
+    if fts_available():
+        return appointments.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [_fts_query(document, terms)]
+        ))
+    for term in terms:
+        appointments = appointments.filter(**{f'search_entry__{document}__contains': term})
+    return appointments
@@ -0,0 +1,58 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import search, stats
+from .models import Appointment
+
+# Fields that feed an appointment's search entry
+SEARCH_FIELDS = {'reason', 'patient', 'patient_id', 'doctor', 'doctor_id'}
+
+# User fields embedded in search entries
+NAME_FIELDS = {'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Appointment)
+def update_doctor_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.record_created(instance.doctor_id, instance.patient_id, instance.status)
+        return
+    # Model.save() refreshes the loaded state only after post_save has run
+    loaded = instance.loaded_state()
+    if loaded is not None:
+        stats.record_saved(instance, loaded)
+
+
+@receiver(post_delete, sender=Appointment)
+def update_doctor_stats_on_delete(sender, instance, **kwargs):
+    loaded = instance.loaded_state() or {
+        'doctor_id': instance.doctor_id, 'patient_id': instance.patient_id, 'status': instance.status
+    }
+    stats.record_deleted(loaded['doctor_id'], loaded['patient_id'], loaded['status'])
+
+
+@receiver(post_save, sender=Appointment)
+def update_search_entry(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not SEARCH_FIELDS & set(update_fields)):
+        return
+    search.index_appointments(Appointment.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_save, sender=User)
+def note_user_name_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Compare with the stored names so saves that leave them alone skip the reindex
+    instance._name_changed = False
+    if raw or instance.pk is None or (update_fields is not None and not NAME_FIELDS & set(update_fields)):
+        return
+    stored = User.objects.filter(pk=instance.pk).values_list('first_name', 'last_name').first()
+    instance._name_changed = stored is not None and stored != (instance.first_name, instance.last_name)
+
+
+@receiver(post_save, sender=User)
+def update_search_entries_for_user(sender, instance, created, raw=False, **kwargs):
+    # Only name changes alter the documents; a new user has no appointments yet
+    if raw or created or not getattr(instance, '_name_changed', False):
+        return
+    search.index_user(instance.pk)
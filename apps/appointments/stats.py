@@ -0,0 +1,119 @@
+"""
+Materialized per-doctor dashboard counters.
+
+DoctorStats holds the pending count and the number of distinct patients,
+and DoctorPatient keeps one row per (doctor, patient) pair with their
+appointment count. Appointment signals adjust both with F() updates, so
+the distinct-patient count changes by one when a pair row is created or
+removed and never needs a scan of the doctor's history.
+
+Counters are only adjusted for doctors that already have a DoctorStats
+row. A missing row is built from scratch by rebuild(), either lazily from
+the dashboard or in bulk by the rebuild_doctor_stats command.
+
+Decrements stop at zero rather than violating the unsigned columns, so a
+counter that has drifted low stays wrong instead of failing the save.
+The reconcile_doctor_stats command finds and rebuilds drifted doctors.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Appointment, DoctorPatient, DoctorStats
+
+
+def _bump(doctor_id, **deltas):
+    """Apply counter deltas, never going below zero; returns False if the doctor has no stats row yet"""
+    changes = {
+        field: F(field) + delta if delta > 0 else Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items() if delta
+    }
+    return DoctorStats.objects.filter(doctor_id=doctor_id).update(updated_at=timezone.now(), **changes) > 0
+
+
+def _link(doctor_id, patient_id):
+    link, created = DoctorPatient.objects.get_or_create(
+        doctor_id=doctor_id, patient_id=patient_id, defaults={'appointment_count': 1}
+    )
+    if created:
+        _bump(doctor_id, total_patients=1)
+    else:
+        DoctorPatient.objects.filter(pk=link.pk).update(appointment_count=F('appointment_count') + 1)
+
+
+def _unlink(doctor_id, patient_id):
+    links = DoctorPatient.objects.filter(doctor_id=doctor_id, patient_id=patient_id)
+    links.filter(appointment_count__gt=0).update(appointment_count=F('appointment_count') - 1)
+    removed, _ = links.filter(appointment_count=0).delete()
+    if removed:
+        _bump(doctor_id, total_patients=-1)
+
+
+def record_created(doctor_id, patient_id, status):
+    if _bump(doctor_id, pending_count=1 if status == 'pending' else 0):
+        _link(doctor_id, patient_id)
+
+
+def record_deleted(doctor_id, patient_id, status):
+    if _bump(doctor_id, pending_count=-1 if status == 'pending' else 0):
+        _unlink(doctor_id, patient_id)
+
+
+def record_status_change(doctor_id, old_status, new_status, count=1):
+    """Adjust the pending count for `count` appointments moving between statuses"""
+    delta = (new_status == 'pending') - (old_status == 'pending')
+    if delta:
+        _bump(doctor_id, pending_count=delta * count)
+
+
+def record_saved(appointment, loaded):
+    """Reconcile counters after an existing appointment is saved, given its previously stored state"""
+    if (loaded['doctor_id'], loaded['patient_id']) != (appointment.doctor_id, appointment.patient_id):
+        record_deleted(loaded['doctor_id'], loaded['patient_id'], loaded['status'])
+        record_created(appointment.doctor_id, appointment.patient_id, appointment.status)
+    elif loaded['status'] != appointment.status:
+        record_status_change(appointment.doctor_id, loaded['status'], appointment.status)
+
+
+def rebuild(doctor_ids=None):
+    """Recompute stats from the appointment table for some or all doctors"""
+    appointments = Appointment.objects.all()
+    if doctor_ids is not None:
+        appointments = appointments.filter(doctor_id__in=doctor_ids)
+
+    pairs = list(
+        appointments.values('doctor_id', 'patient_id').annotate(count=Count('id')).order_by()
+    )
+    pending = dict(
+        appointments.values('doctor_id').annotate(
+            pending=Count('id', filter=Q(status='pending'))
+        ).order_by().values_list('doctor_id', 'pending')
+    )
+
+    if doctor_ids is None:
+        doctor_ids = set(pending)
+    patients = {}
+    for pair in pairs:
+        patients[pair['doctor_id']] = patients.get(pair['doctor_id'], 0) + 1
+
+    with transaction.atomic():
+        DoctorPatient.objects.filter(doctor_id__in=doctor_ids).delete()
+        DoctorPatient.objects.bulk_create([
+            DoctorPatient(doctor_id=pair['doctor_id'], patient_id=pair['patient_id'], appointment_count=pair['count'])
+            for pair in pairs
+        ], batch_size=1000)
+        DoctorStats.objects.bulk_create(
+            [
+                DoctorStats(
+                    doctor_id=doctor_id,
+                    pending_count=pending.get(doctor_id, 0),
+                    total_patients=patients.get(doctor_id, 0),
+                )
+                for doctor_id in doctor_ids
+            ],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['doctor'],
+            update_fields=['pending_count', 'total_patients', 'updated_at'],
+        )
@@ -12,9 +12,13 @@ urlpatterns = [
     path('<int:pk>/', views.appointment_detail, name='detail'),
     path('<int:pk>/update/', views.appointment_update, name='update'),
     path('<int:pk>/cancel/', views.appointment_cancel, name='cancel'),
+    path('bulk-action/', views.doctor_bulk_action, name='bulk_action'),
     path('<int:pk>/<str:action>/', views.doctor_appointment_action, name='appointment_action'),
     path('patient/<int:patient_id>/records/', views.patient_records, name='patient_records'),
     path('calendar/', views.calendar_view, name='calendar'),
+    path('calendar/feed/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
+    path('calendar/feed/regenerate/', views.regenerate_calendar_feed, name='regenerate_calendar_feed'),
+    path('api/events/', views.calendar_events, name='calendar_events'),
     
     # Doctor availability URLs
     path('availability/', views.doctor_availability, name='availability'),
@@ -22,4 +26,6 @@ urlpatterns = [
     path('availability/<int:pk>/update/', views.availability_update, name='availability_update'),
     path('availability/<int:pk>/delete/', views.availability_delete, name='availability_delete'),
     path('check-availability/', views.check_availability, name='check_availability'),
+    path('api/open-slots/', views.search_availability, name='search_availability'),
+    path('api/hold-slot/', views.hold_appointment_slot, name='hold_slot'),
 ]
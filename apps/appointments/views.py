@@ -1,60 +1,119 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
-from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Q, Value, When, Window
+from django.db.models.functions import RowNumber
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import condition
 from django.contrib.auth.models import User
 from django.utils import timezone
-from .models import Appointment, DoctorAvailability
+from django.utils.dateparse import parse_date
+from .models import Appointment, DoctorAvailability, DoctorStats
 from .forms import AppointmentForm, DoctorAvailabilityForm, AppointmentUpdateForm
-from apps.accounts.models import UserProfile, Notification
+from .availability import ACTIVE_STATUSES, AvailabilityEngine, earliest_open_slots
+from .booking import SlotUnavailable, claim_slot, hold_slot
+from . import ical, search, stats
+from apps.accounts import notifications
+from apps.accounts.models import UserProfile
+from apps.accounts.profiles import get_user_profile
+from apps.accounts.counters import active_doctor_count
 from datetime import datetime, timedelta
 
 
+def _visible_appointments(user_profile, user):
+    """Appointments a user may see, by role"""
+    if user_profile.role == 'mother':
+        return Appointment.objects.filter(patient=user)
+    elif user_profile.role == 'doctor':
+        return Appointment.objects.filter(doctor=user)
+    return Appointment.objects.all()  # admin
+
+
+APPOINTMENTS_PER_PAGE = 10
+
+
+SEEK_TIME_FORMAT = '%H:%M:%S.%f'
+
+
+def _seek_cursor(appointment):
+    return f"{appointment.date.isoformat()}_{appointment.time.strftime(SEEK_TIME_FORMAT)}_{appointment.pk}"
+
+
+def _parse_seek_cursor(value):
+    """(date, time, id) from a list cursor, or None if it is malformed"""
+    try:
+        date_part, time_part, pk = value.split('_')
+        return datetime.strptime(date_part, '%Y-%m-%d').date(), datetime.strptime(time_part, SEEK_TIME_FORMAT).time(), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _seek_page(appointments, after=None, before=None, size=APPOINTMENTS_PER_PAGE):
+    """
+    One page of appointments, newest first, by keyset on (date, time, id).
+    
+    Returns (page, next_cursor, previous_cursor); each cursor is None at that end.
+    """
+    if before:
+        date, time, pk = before
+        newer = appointments.filter(
+            Q(date__gt=date) | Q(date=date, time__gt=time) | Q(date=date, time=time, id__gt=pk)
+        ).order_by('date', 'time', 'id')
+        rows = list(newer[:size + 1])
+        page = rows[:size][::-1]
+        previous_cursor = _seek_cursor(page[0]) if len(rows) > size else None
+        next_cursor = _seek_cursor(page[-1]) if page else None
+        return page, next_cursor, previous_cursor
+    
+    if after:
+        date, time, pk = after
+        appointments = appointments.filter(
+            Q(date__lt=date) | Q(date=date, time__lt=time) | Q(date=date, time=time, id__lt=pk)
+        )
+    rows = list(appointments.order_by('-date', '-time', '-id')[:size + 1])
+    page = rows[:size]
+    next_cursor = _seek_cursor(page[-1]) if len(rows) > size else None
+    previous_cursor = _seek_cursor(page[0]) if after and page else None
+    return page, next_cursor, previous_cursor
+
+
 @login_required
 def appointment_list(request):
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
-    if user_profile.role == 'mother':
-        appointments = Appointment.objects.filter(patient=request.user)
-    elif user_profile.role == 'doctor':
-        appointments = Appointment.objects.filter(doctor=request.user)
-    else:  # admin
-        appointments = Appointment.objects.all()
+    appointments = _visible_appointments(user_profile, request.user).select_related('doctor', 'patient')
     
     # Filter by status if provided
     status_filter = request.GET.get('status')
     if status_filter:
         appointments = appointments.filter(status=status_filter)
     
-    # Search functionality
+    # Search functionality, served by the prebuilt search index
     search_query = request.GET.get('search')
     if search_query:
-        if user_profile.role == 'mother':
-            appointments = appointments.filter(
-                Q(doctor__first_name__icontains=search_query) |
-                Q(doctor__last_name__icontains=search_query) |
-                Q(reason__icontains=search_query)
-            )
-        else:
-            appointments = appointments.filter(
-                Q(patient__first_name__icontains=search_query) |
-                Q(patient__last_name__icontains=search_query) |
-                Q(reason__icontains=search_query)
-            )
+        document = 'doctor_document' if user_profile.role == 'mother' else 'patient_document'
+        appointments = search.search(appointments, search_query, document)
     
-    appointments = appointments.order_by('-date', '-time')
+    # Keyset pagination: cost depends on the page size, not how deep the page is
+    page, next_cursor, previous_cursor = _seek_page(
+        appointments,
+        after=_parse_seek_cursor(request.GET.get('after')),
+        before=_parse_seek_cursor(request.GET.get('before')),
+    )
     
-    # Pagination
-    paginator = Paginator(appointments, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Current filters, carried over to the next/previous links
+    filters = request.GET.copy()
+    for key in ('after', 'before', 'page'):
+        filters.pop(key, None)
     
     return render(request, 'appointments/list.html', {
-        'appointments': page_obj,
-        'page_obj': page_obj,
-        'is_paginated': page_obj.has_other_pages(),
+        'appointments': page,
+        'next_cursor': next_cursor,
+        'previous_cursor': previous_cursor,
+        'is_paginated': bool(next_cursor or previous_cursor),
+        'filter_query': filters.urlencode(),
         'user_profile': user_profile,
         'status_filter': status_filter,
         'search_query': search_query,
@@ -63,7 +122,7 @@ def appointment_list(request):
 
 @login_required
 def appointment_create(request):
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     # Only mothers can create appointments
     if user_profile.role != 'mother':
@@ -76,10 +135,10 @@ def appointment_create(request):
             try:
                 appointment = form.save(commit=False)
                 appointment.patient = request.user
-                appointment.save()
+                claim_slot(appointment)
                 
                 # Create notification for doctor
-                Notification.objects.create(
+                notifications.notify(
                     user=appointment.doctor,
                     title='New Appointment Booked',
                     message=f'{appointment.patient.get_full_name()} has booked an appointment for {appointment.date} at {appointment.time}.',
@@ -88,6 +147,8 @@ def appointment_create(request):
                 
                 messages.success(request, f'Appointment booked successfully! Your appointment with Dr. {appointment.doctor.get_full_name()} is scheduled for {appointment.date} at {appointment.time}.')
                 return redirect('appointments:list')
+            except SlotUnavailable as e:
+                messages.error(request, str(e))
             except Exception as e:
                 messages.error(request, f'Error creating appointment: {str(e)}')
         else:
@@ -106,7 +167,7 @@ def appointment_create(request):
 @login_required
 def appointment_detail(request, pk):
     appointment = get_object_or_404(Appointment, pk=pk)
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     # Check permissions
     if user_profile.role == 'mother' and appointment.patient != request.user:
@@ -125,7 +186,7 @@ def appointment_detail(request, pk):
 @login_required
 def appointment_update(request, pk):
     appointment = get_object_or_404(Appointment, pk=pk)
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     # Check permissions
     if user_profile.role == 'mother':
@@ -155,11 +216,19 @@ def appointment_update(request, pk):
             form = form_class(request.POST, instance=appointment)
         
         if form.is_valid():
-            updated_appointment = form.save()
+            if user_profile.role == 'mother':
+                # Rescheduling competes for the new slot like a fresh booking
+                try:
+                    updated_appointment = claim_slot(form.save(commit=False))
+                except SlotUnavailable as e:
+                    messages.error(request, str(e))
+                    return redirect('appointments:update', pk=pk)
+            else:
+                updated_appointment = form.save()
             
             # Create notification for relevant parties
             if user_profile.role == 'doctor' and 'status' in form.changed_data:
-                Notification.objects.create(
+                notifications.notify(
                     user=updated_appointment.patient,
                     title='Appointment Status Updated',
                     message=f'Your appointment status has been updated to {updated_appointment.get_status_display()}.',
@@ -184,7 +253,7 @@ def appointment_update(request, pk):
 @login_required
 def appointment_cancel(request, pk):
     appointment = get_object_or_404(Appointment, pk=pk)
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     # Check permissions
     if user_profile.role == 'mother' and appointment.patient != request.user:
@@ -204,14 +273,14 @@ def appointment_cancel(request, pk):
         
         # Create notification for the other party
         if user_profile.role == 'mother':
-            Notification.objects.create(
+            notifications.notify(
                 user=appointment.doctor,
                 title='Appointment Cancelled',
                 message=f'{appointment.patient.get_full_name()} has cancelled the appointment scheduled for {appointment.date} at {appointment.time}.',
                 notification_type='appointment'
             )
         else:
-            Notification.objects.create(
+            notifications.notify(
                 user=appointment.patient,
                 title='Appointment Cancelled',
                 message=f'Your appointment with Dr. {appointment.doctor.get_full_name()} scheduled for {appointment.date} at {appointment.time} has been cancelled.',
@@ -226,7 +295,7 @@ def appointment_cancel(request, pk):
 
 @login_required
 def doctor_availability(request):
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     # Only doctors can manage availability
     if user_profile.role != 'doctor':
@@ -242,7 +311,7 @@ def doctor_availability(request):
 
 @login_required
 def availability_create(request):
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     if user_profile.role != 'doctor':
         messages.error(request, 'Only doctors can set availability.')
@@ -292,29 +361,116 @@ def availability_delete(request, pk):
 
 @login_required
 def calendar_view(request):
-    user_profile = get_object_or_404(UserProfile, user=request.user)
-    
-    if user_profile.role == 'mother':
-        appointments = Appointment.objects.filter(patient=request.user)
-    elif user_profile.role == 'doctor':
-        appointments = Appointment.objects.filter(doctor=request.user)
-    else:  # admin
-        appointments = Appointment.objects.all()
-    
-    # Filter by current month if no specific date range provided
-    current_month = timezone.now().date().replace(day=1)
-    appointments = appointments.filter(date__gte=current_month)
+    user_profile = get_user_profile(request)
     
+    # Appointments are not listed here; calendar widgets fetch them from calendar_events
     # Get all active doctors for the calendar view
-    doctors = User.objects.filter(userprofile__role='doctor', is_active=True).prefetch_related('availabilities')
+    doctors = User.objects.filter(
+        userprofile__role='doctor',
+        is_active=True
+    ).select_related('userprofile').prefetch_related('availabilities')
     
     return render(request, 'appointments/calendar.html', {
-        'appointments': appointments,
         'user_profile': user_profile,
         'doctors': doctors,
+        'feed_url': request.build_absolute_uri(
+            reverse('appointments:calendar_feed', kwargs={'token': ical.feed_token(request.user)})
+        ),
     })
 
 
+@login_required
+def regenerate_calendar_feed(request):
+    """Issue a new calendar feed URL; the old one stops working"""
+    if request.method == 'POST':
+        ical.regenerate_feed_token(request.user)
+        messages.success(request, 'Your calendar link has been reset. Update it in your calendar app.')
+    return redirect('appointments:calendar')
+
+
+@login_required
+def calendar_events(request):
+    """AJAX view returning the appointments inside one calendar window"""
+    start = parse_date((request.GET.get('start') or '')[:10])
+    end = parse_date((request.GET.get('end') or '')[:10])
+    if not start or not end or end < start:
+        return JsonResponse({'error': 'Provide start and end as YYYY-MM-DD'}, status=400)
+    if (end - start).days > 366:
+        return JsonResponse({'error': 'Window may span at most one year'}, status=400)
+    
+    user_profile = get_user_profile(request)
+    
+    # Plain dicts with joined names; no model instances are built
+    rows = _visible_appointments(user_profile, request.user).filter(
+        date__gte=start,
+        date__lt=end
+    ).order_by('date', 'time').values(
+        'id', 'date', 'time', 'end_time', 'status', 'appointment_type',
+        'patient_id', 'doctor_id',
+        'patient__first_name', 'patient__last_name',
+        'doctor__first_name', 'doctor__last_name',
+    )
+    
+    events = []
+    for row in rows:
+        doctor_name = f"Dr. {row['doctor__first_name']} {row['doctor__last_name']}".strip()
+        patient_name = f"{row['patient__first_name']} {row['patient__last_name']}".strip()
+        events.append({
+            'id': row['id'],
+            'title': doctor_name if row['patient_id'] == request.user.pk else patient_name,
+            'start': f"{row['date'].isoformat()}T{row['time'].strftime('%H:%M:%S')}",
+            'end': f"{row['date'].isoformat()}T{row['end_time'].strftime('%H:%M:%S')}",
+            'status': row['status'],
+            'appointment_type': row['appointment_type'],
+            'doctor': doctor_name,
+            'patient': patient_name,
+            'url': reverse('appointments:detail', kwargs={'pk': row['id']}),
+        })
+    
+    return JsonResponse({'events': events, 'start': start.isoformat(), 'end': end.isoformat()})
+
+
+def _calendar_feed_state(request, token):
+    """Resolve a feed token once per request: (user, appointments, count, last_modified)"""
+    if not hasattr(request, '_calendar_feed_state'):
+        user = ical.user_from_token(token)
+        if user is None:
+            request._calendar_feed_state = (None, None, 0, None)
+        else:
+            appointments = ical.feed_appointments(user)
+            count, last_modified = ical.feed_version(appointments)
+            request._calendar_feed_state = (user, appointments, count, last_modified)
+    return request._calendar_feed_state
+
+
+def _calendar_feed_etag(request, token):
+    user, _, count, last_modified = _calendar_feed_state(request, token)
+    if user is None:
+        return None
+    stamp = last_modified.timestamp() if last_modified else 0
+    return f'{user.pk}-{count}-{stamp}'
+
+
+def _calendar_feed_last_modified(request, token):
+    return _calendar_feed_state(request, token)[3]
+
+
+@condition(etag_func=_calendar_feed_etag, last_modified_func=_calendar_feed_last_modified)
+def calendar_feed(request, token):
+    """Token-authenticated iCalendar feed for calendar clients"""
+    user, appointments, _, _ = _calendar_feed_state(request, token)
+    if user is None:
+        raise Http404('Unknown calendar feed')
+    
+    response = StreamingHttpResponse(
+        ical.generate_feed(user, appointments),
+        content_type='text/calendar; charset=utf-8'
+    )
+    response['Content-Disposition'] = 'inline; filename="appointments.ics"'
+    response['Cache-Control'] = 'private, max-age=300'
+    return response
+
+
 @login_required
 def check_availability(request):
     """AJAX view to check doctor availability for a specific date"""
@@ -326,55 +482,30 @@ def check_availability(request):
             return JsonResponse({'error': 'Missing doctor_id or date'}, status=400)
         
         try:
-            from datetime import datetime, time as dt_time, timedelta
+            duration = min(max(int(request.GET.get('duration', 30)), 1), 240)
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Invalid duration'}, status=400)
+        
+        try:
             doctor = User.objects.get(id=doctor_id, userprofile__role='doctor')
             date = datetime.strptime(date_str, '%Y-%m-%d').date()
             day_of_week = date.weekday()
             
-            # Get doctor availability for this day
-            availability = DoctorAvailability.objects.filter(
-                doctor=doctor,
-                day_of_week=day_of_week,
-                is_active=True
-            ).first()
+            engine = AvailabilityEngine([doctor.pk], date, date, hold_owner_id=request.user.pk)
             
-            if not availability:
-                # Create default availability if none exists
-                if day_of_week < 5:  # Weekday
-                    availability = DoctorAvailability.objects.create(
-                        doctor=doctor,
-                        day_of_week=day_of_week,
-                        start_time=dt_time(9, 0),
-                        end_time=dt_time(17, 0),
-                        is_active=True
-                    )
-                else:
+            if not engine.has_windows(doctor.pk, day_of_week):
+                if day_of_week >= 5:  # Weekend
                     return JsonResponse({'available_times': [], 'message': 'Doctor not available on weekends'})
+                return JsonResponse({'available_times': [], 'message': 'Doctor not available on this day'})
             
-            # Generate available time slots
-            available_times = []
-            current_time = availability.start_time
-            end_time = availability.end_time
-            
-            while current_time < end_time:
-                # Check if this time slot is available
-                slot_taken = Appointment.objects.filter(
-                    doctor=doctor,
-                    date=date,
-                    time=current_time,
-                    status__in=['pending', 'approved']
-                ).exists()
-                
-                if not slot_taken:
-                    available_times.append({
-                        'time': current_time.strftime('%H:%M'),
-                        'display': current_time.strftime('%I:%M %p')
-                    })
-                
-                # Add 30 minutes
-                current_datetime = timezone.datetime.combine(date, current_time)
-                current_datetime += timedelta(minutes=30)
-                current_time = current_datetime.time()
+            # Start times that fit the duration come straight from the day's bitmap
+            available_times = [
+                {
+                    'time': slot.strftime('%H:%M'),
+                    'display': slot.strftime('%I:%M %p')
+                }
+                for slot in engine.free_slots(doctor.pk, date, duration)
+            ]
             
             return JsonResponse({
                 'available_times': available_times,
@@ -391,10 +522,96 @@ def check_availability(request):
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 
+@login_required
+def search_availability(request):
+    """AJAX view returning the earliest open slots across all active doctors"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        start_str = request.GET.get('start')
+        today = timezone.localdate()
+        start_date = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else today
+        days = min(max(int(request.GET.get('days', 14)), 1), 60)
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+        duration = min(max(int(request.GET.get('duration', 30)), 1), 240)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start, days, limit or duration'}, status=400)
+    
+    if start_date < today:
+        start_date = today
+    end_date = start_date + timedelta(days=days - 1)
+    
+    doctors = User.objects.filter(userprofile__role='doctor', is_active=True)
+    specialization = request.GET.get('specialization')
+    if specialization:
+        doctors = doctors.filter(userprofile__specialization__icontains=specialization)
+    doctor_info = {
+        doctor_id: (f'{first_name} {last_name}'.strip(), doctor_specialization)
+        for doctor_id, first_name, last_name, doctor_specialization in doctors.values_list(
+            'id', 'first_name', 'last_name', 'userprofile__specialization'
+        )
+    }
+    
+    # Skip slots that have already started today
+    now = timezone.localtime().replace(tzinfo=None)
+    slots = earliest_open_slots(
+        doctor_info.keys(), start_date, end_date, limit,
+        after=now, duration_minutes=duration, hold_owner_id=request.user.pk
+    )
+    
+    return JsonResponse({
+        'slots': [
+            {
+                'doctor_id': doctor_id,
+                'doctor_name': doctor_info[doctor_id][0],
+                'specialization': doctor_info[doctor_id][1],
+                'date': slot_date.isoformat(),
+                'time': slot.strftime('%H:%M'),
+                'display': slot.strftime('%I:%M %p'),
+            }
+            for slot_date, slot, doctor_id in slots
+        ],
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+    })
+
+
+@login_required
+def hold_appointment_slot(request):
+    """AJAX view to reserve a slot for a few minutes while the booking form is completed"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    doctor_id = request.POST.get('doctor_id')
+    date_str = request.POST.get('date')
+    time_str = request.POST.get('time')
+    if not doctor_id or not date_str or not time_str:
+        return JsonResponse({'error': 'Missing doctor_id, date or time'}, status=400)
+    
+    try:
+        doctor_id = int(doctor_id)
+        date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        start = datetime.strptime(time_str, '%H:%M').time()
+        duration = min(max(int(request.POST.get('duration', 30)), 1), 240)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid doctor_id, date, time or duration'}, status=400)
+    
+    if not User.objects.filter(id=doctor_id, userprofile__role='doctor', is_active=True).exists():
+        return JsonResponse({'error': 'Doctor not found'}, status=404)
+    
+    try:
+        hold = hold_slot(doctor_id, date, start, duration, request.user)
+    except SlotUnavailable as e:
+        return JsonResponse({'held': False, 'message': str(e)}, status=409)
+    
+    return JsonResponse({'held': True, 'expires_at': hold.expires_at.isoformat()})
+
+
 @login_required
 def doctor_directory(request):
     """View all available doctors with their profiles and availability"""
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     # Get all active doctors
     doctors = User.objects.filter(
@@ -427,7 +644,7 @@ def doctor_directory(request):
 @login_required
 def doctor_dashboard(request):
     """Enhanced doctor dashboard with appointment overview"""
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     if user_profile.role != 'doctor':
         messages.error(request, 'This page is only accessible to doctors.')
@@ -439,7 +656,7 @@ def doctor_dashboard(request):
     all_appointments = Appointment.objects.filter(doctor=request.user).select_related('patient', 'patient__userprofile')
     
     # Today's appointments (all statuses)
-    today_appointments = all_appointments.filter(date=today).order_by('time')
+    today_appointments = list(all_appointments.filter(date=today).order_by('time'))
     
     # Upcoming appointments (future dates, pending or approved)
     upcoming_appointments = all_appointments.filter(
@@ -447,14 +664,17 @@ def doctor_dashboard(request):
         status__in=['pending', 'approved']
     ).order_by('date', 'time')[:5]
     
-    # Pending approvals (all pending regardless of date)
-    pending_appointments = all_appointments.filter(status='pending').count()
+    # Pending and unique patient counts come from the materialized stats row
+    doctor_stats = DoctorStats.objects.filter(doctor=request.user).first()
+    if doctor_stats is None:
+        stats.rebuild([request.user.pk])
+        doctor_stats = DoctorStats.objects.get(doctor=request.user)
+    pending_appointments = doctor_stats.pending_count
+    total_patients = doctor_stats.total_patients
     
     # Completed today
-    completed_today = all_appointments.filter(date=today, status='completed').count()
-    
-    # Total unique patients
-    total_patients = all_appointments.values('patient').distinct().count()
+    completed_today = sum(1 for appointment in today_appointments if appointment.status == 'completed')
+    today_pending_ids = [appointment.pk for appointment in today_appointments if appointment.status == 'pending']
     
     # Check if user is new (first login)
     is_new_user = request.user.last_login is None
@@ -465,6 +685,7 @@ def doctor_dashboard(request):
         'upcoming_appointments': upcoming_appointments,
         'pending_appointments': pending_appointments,
         'completed_today': completed_today,
+        'today_pending_ids': today_pending_ids,
         'total_patients': total_patients,
         'is_new_user': is_new_user,
     }
@@ -475,37 +696,47 @@ def doctor_dashboard(request):
 @login_required
 def mother_dashboard(request):
     """Enhanced mother dashboard with appointment overview"""
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     if user_profile.role != 'mother':
         messages.error(request, 'This page is only accessible to mothers.')
         return redirect('accounts:dashboard')
     
-    # Get appointments
     today = timezone.now().date()
-    upcoming_appointments = Appointment.objects.filter(
-        patient=request.user,
-        date__gte=today,
-        status__in=['pending', 'approved']
-    ).order_by('date', 'time')[:5]
-    
-    recent_appointments = Appointment.objects.filter(
-        patient=request.user,
-        status='completed'
-    ).order_by('-date', '-time')[:5]
-    
-    pending_appointments = Appointment.objects.filter(
-        patient=request.user,
-        status='pending'
-    ).count()
-    
-    total_appointments = Appointment.objects.filter(patient=request.user).count()
+    my_appointments = Appointment.objects.filter(patient=request.user)
+    
+    # Both counts in one conditional aggregate
+    counts = my_appointments.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='pending')),
+    )
+    pending_appointments = counts['pending']
+    total_appointments = counts['total']
+    
+    # Next 5 upcoming and last 5 completed in one windowed query
+    ranked = my_appointments.annotate(
+        bucket=Case(
+            When(status__in=['pending', 'approved'], date__gte=today, then=Value('upcoming')),
+            When(status='completed', then=Value('recent')),
+            output_field=CharField(),
+        )
+    ).filter(bucket__isnull=False).annotate(
+        upcoming_rank=Window(RowNumber(), partition_by=[F('bucket')], order_by=[F('date').asc(), F('time').asc()]),
+        recent_rank=Window(RowNumber(), partition_by=[F('bucket')], order_by=[F('date').desc(), F('time').desc()]),
+    ).filter(
+        Q(bucket='upcoming', upcoming_rank__lte=5) | Q(bucket='recent', recent_rank__lte=5)
+    ).select_related('doctor').order_by('date', 'time')
+    
+    upcoming_appointments = []
+    recent_appointments = []
+    for appointment in ranked:
+        if appointment.bucket == 'upcoming':
+            upcoming_appointments.append(appointment)
+        else:
+            recent_appointments.insert(0, appointment)
     
     # Get available doctors count
-    available_doctors = User.objects.filter(
-        userprofile__role='doctor',
-        is_active=True
-    ).count()
+    available_doctors = active_doctor_count()
     
     # Check if user is new (first login)
     is_new_user = request.user.last_login is None
@@ -523,10 +754,38 @@ def mother_dashboard(request):
     return render(request, 'appointments/mother_dashboard.html', context)
 
 
+# action: (new status, statuses it may be applied to, notification title, notification message)
+DOCTOR_ACTIONS = {
+    'approve': (
+        'approved', ['pending'], 'Appointment Approved',
+        'Your appointment on {date} at {time} has been approved by Dr. {doctor}.',
+    ),
+    'decline': (
+        'cancelled', ['pending', 'approved'], 'Appointment Declined',
+        'Your appointment request for {date} at {time} was declined.',
+    ),
+    'complete': (
+        'completed', ['approved'], 'Appointment Completed',
+        'Your appointment on {date} has been completed. Check your medical records for details.',
+    ),
+}
+
+# Most appointments a single bulk request may change
+BULK_ACTION_LIMIT = 200
+
+
+def _action_notification(action, patient_id, date, time, doctor):
+    """Unsaved notification telling a patient about a doctor's action"""
+    _, _, title, message = DOCTOR_ACTIONS[action]
+    return notifications.build(
+        patient_id, title, message.format(date=date, time=time, doctor=doctor.get_full_name()), 'appointment'
+    )
+
+
 @login_required
 def doctor_appointment_action(request, pk, action):
     """Quick approve/decline/complete appointment"""
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     if user_profile.role != 'doctor':
         messages.error(request, 'Only doctors can perform this action.')
@@ -534,41 +793,35 @@ def doctor_appointment_action(request, pk, action):
     
     appointment = get_object_or_404(Appointment, pk=pk, doctor=request.user)
     
+    if action not in DOCTOR_ACTIONS:
+        messages.error(request, 'Invalid action.')
+        return redirect('appointments:detail', pk=pk)
+    
+    new_status, from_statuses, _, _ = DOCTOR_ACTIONS[action]
+    if appointment.status not in from_statuses:
+        messages.error(request, f'A {appointment.status} appointment cannot be {new_status}.')
+        return redirect('appointments:detail', pk=pk)
+    
+    reactivating = appointment.status not in ACTIVE_STATUSES and new_status in ACTIVE_STATUSES
+    appointment.status = new_status
+    if reactivating:
+        # The slot may have been taken since the appointment was freed
+        try:
+            claim_slot(appointment)
+        except SlotUnavailable as e:
+            messages.error(request, str(e))
+            return redirect('appointments:detail', pk=pk)
+    else:
+        appointment.save()
+    
+    notifications.notify_many([_action_notification(action, appointment.patient_id, appointment.date, appointment.time, request.user)])
+    
     if action == 'approve':
-        appointment.status = 'approved'
         messages.success(request, f'Appointment with {appointment.patient.get_full_name()} approved successfully!')
-        
-        Notification.objects.create(
-            user=appointment.patient,
-            title='Appointment Approved',
-            message=f'Your appointment on {appointment.date} at {appointment.time} has been approved by Dr. {appointment.doctor.get_full_name()}.',
-            notification_type='appointment'
-        )
     elif action == 'decline':
-        appointment.status = 'cancelled'
         messages.success(request, 'Appointment declined.')
-        
-        Notification.objects.create(
-            user=appointment.patient,
-            title='Appointment Declined',
-            message=f'Your appointment request for {appointment.date} at {appointment.time} was declined.',
-            notification_type='appointment'
-        )
-    elif action == 'complete':
-        appointment.status = 'completed'
-        messages.success(request, f'Appointment with {appointment.patient.get_full_name()} marked as completed!')
-        
-        Notification.objects.create(
-            user=appointment.patient,
-            title='Appointment Completed',
-            message=f'Your appointment on {appointment.date} has been completed. Check your medical records for details.',
-            notification_type='appointment'
-        )
     else:
-        messages.error(request, 'Invalid action.')
-        return redirect('appointments:detail', pk=pk)
-    
-    appointment.save()
+        messages.success(request, f'Appointment with {appointment.patient.get_full_name()} marked as completed!')
     
     # Redirect back to dashboard or detail based on request
     if request.GET.get('from') == 'dashboard':
@@ -576,10 +829,78 @@ def doctor_appointment_action(request, pk, action):
     return redirect('appointments:detail', pk=pk)
 
 
+@login_required
+def doctor_bulk_action(request):
+    """Approve, decline or complete many appointments in one transaction"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    user_profile = get_user_profile(request)
+    wants_json = 'application/json' in request.headers.get('Accept', '')
+    if user_profile.role != 'doctor':
+        if wants_json:
+            return JsonResponse({'error': 'Only doctors can perform this action.'}, status=403)
+        messages.error(request, 'Only doctors can perform this action.')
+        return redirect('appointments:list')
+    
+    action = request.POST.get('action')
+    try:
+        ids = list(dict.fromkeys(int(pk) for pk in request.POST.getlist('ids')))
+    except ValueError:
+        return JsonResponse({'error': 'ids must be integers'}, status=400)
+    if action not in DOCTOR_ACTIONS or not ids:
+        return JsonResponse({'error': 'Provide an action (approve, decline or complete) and ids'}, status=400)
+    if len(ids) > BULK_ACTION_LIMIT:
+        return JsonResponse({'error': f'At most {BULK_ACTION_LIMIT} appointments per request'}, status=400)
+    
+    new_status, from_statuses, _, _ = DOCTOR_ACTIONS[action]
+    results = {pk: 'not_found' for pk in ids}
+    
+    with transaction.atomic():
+        rows = list(
+            Appointment.objects.select_for_update().filter(id__in=ids, doctor=request.user)
+            .values('id', 'status', 'patient_id', 'date', 'time')
+        )
+        changed = [row for row in rows if row['status'] in from_statuses]
+        for row in rows:
+            results[row['id']] = f"skipped: {row['status']}"
+        
+        if changed:
+            # One UPDATE for the whole batch; signals do not run, so counters are adjusted below
+            Appointment.objects.filter(
+                id__in=[row['id'] for row in changed], status__in=from_statuses
+            ).update(status=new_status, updated_at=timezone.now())
+            
+            for old_status in from_statuses:
+                count = sum(1 for row in changed if row['status'] == old_status)
+                if count:
+                    stats.record_status_change(request.user.pk, old_status, new_status, count)
+            
+            # Written in this transaction, so the notifications commit or roll back with the update
+            notifications.deliver([
+                _action_notification(action, row['patient_id'], row['date'], row['time'], request.user)
+                for row in changed
+            ])
+            for row in changed:
+                results[row['id']] = new_status
+    
+    if wants_json:
+        return JsonResponse({
+            'action': action,
+            'updated': len(changed),
+            'results': {str(pk): result for pk, result in results.items()},
+        })
+    
+    messages.success(request, f'{len(changed)} of {len(ids)} appointments {new_status}.')
+    if request.POST.get('from') == 'dashboard':
+        return redirect('appointments:doctor_dashboard')
+    return redirect('appointments:list')
+
+
 @login_required
 def patient_records(request, patient_id):
     """View patient medical history"""
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     if user_profile.role != 'doctor':
         messages.error(request, 'Only doctors can view patient records.')
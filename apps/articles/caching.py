@@ -0,0 +1,152 @@
+"""
+Page and fragment caching for anonymous article traffic.
+
+Anonymous GET requests for the article list and detail pages are answered
+from whole rendered responses kept in the default cache. A page's key
+holds a version token, so changes make old entries unreachable instead of
+deleting them:
+
+* Detail pages use the article's version: its updated_at plus a counter
+  bumped whenever one of its comments changes. The version itself is
+  cached per slug, so a cache hit needs no database query at all.
+* List pages use a site-wide generation, bumped by any article or
+  category change.
+
+Signals in signals.py drop or bump these versions. The comment list is
+also cached as a template fragment under the comment counter, which spares
+signed-in readers the comment queries.
+
+Every response carries an ETag derived from the version, and anonymous
+responses are publicly cacheable for ARTICLE_PAGE_MAX_AGE seconds.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+from .models import Article
+
+DEFAULT_TIMEOUT = 600
+DEFAULT_MAX_AGE = 60
+
+ARTICLE_VERSION_KEY = 'articles:version:{slug}'
+COMMENTS_VERSION_KEY = 'articles:comments:{article_id}'
+LIST_GENERATION_KEY = 'articles:list_generation'
+PAGE_KEY = 'articles:page:{name}:{version}:{params}'
+
+
+def page_timeout():
+    return getattr(settings, 'ARTICLE_PAGE_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def _counter(key):
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, 1, None)
+        value = cache.get(key, 1)
+    return value
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 2, None)
+
+
+def comments_version(article_id):
+    return _counter(COMMENTS_VERSION_KEY.format(article_id=article_id))
+
+
+def article_version(slug):
+    """(article id, version token) of a published article, or None if there is none"""
+    key = ARTICLE_VERSION_KEY.format(slug=slug)
+    version = cache.get(key)
+    if version is None:
+        row = Article.objects.filter(slug=slug, status='published').values_list('id', 'updated_at').first()
+        if row is None:
+            return None
+        version = (row[0], f'{row[1].timestamp():.6f}')
+        cache.set(key, version, page_timeout())
+    article_id, updated = version
+    return article_id, f'{updated}.{comments_version(article_id)}'
+
+
+def list_generation():
+    return _counter(LIST_GENERATION_KEY)
+
+
+def invalidate_article(slug):
+    cache.delete(ARTICLE_VERSION_KEY.format(slug=slug))
+    _bump(LIST_GENERATION_KEY)
+
+
+def invalidate_comments(article_id):
+    _bump(COMMENTS_VERSION_KEY.format(article_id=article_id))
+
+
+def invalidate_lists():
+    _bump(LIST_GENERATION_KEY)
+
+
+def is_cacheable(request):
+    """Only anonymous reads with no flash messages waiting are served from or stored in the cache"""
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def page_key(name, version, request):
+    params = hashlib.md5(request.GET.urlencode().encode()).hexdigest()
+    return PAGE_KEY.format(name=name, version=version, params=params)
+
+
+def etag_for(key):
+    return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+
+def cached_response(request, key):
+    """A 304, the stored response, or None if the page has to be rendered"""
+    etag = etag_for(key)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = cache.get(key)
+    if response is not None:
+        add_headers(response, key)
+    return response
+
+
+def store_response(key, response):
+    """Keep a freshly rendered anonymous page and mark it publicly cacheable"""
+    if response.status_code == 200 and not response.streaming and not response.cookies:
+        cache.set(key, response, page_timeout())
+        add_headers(response, key)
+
+
+def add_headers(response, key):
+    response['ETag'] = etag_for(key)
+    # Signed-in users get a different page at the same URL
+    patch_vary_headers(response, ['Cookie'])
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'ARTICLE_PAGE_MAX_AGE', DEFAULT_MAX_AGE))
+
+
+def cache_list_page(view):
+    """Serve anonymous requests for a listing view from the page cache, keyed on the list generation"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_cacheable(request):
+            return view(request, *args, **kwargs)
+        name = ':'.join([view.__name__, *map(str, kwargs.values())])
+        key = page_key(name, list_generation(), request)
+        response = cached_response(request, key)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            store_response(key, response)
+        return response
+    return wrapper
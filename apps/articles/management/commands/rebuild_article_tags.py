@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.articles.models import Article
+from apps.articles.tags import refresh_tag_counts, sync_article_tags
+
+
+class Command(BaseCommand):
+    help = 'Re-sync the normalized tag rows from Article.tags and recount the tag cloud'
+
+    def handle(self, *args, **options):
+        synced = 0
+        with transaction.atomic():
+            for article in Article.objects.only('id', 'tags').iterator(chunk_size=500):
+                sync_article_tags(article)
+                synced += 1
+            refresh_tag_counts()
+        self.stdout.write(self.style.SUCCESS(f'Synced tags for {synced} articles.'))
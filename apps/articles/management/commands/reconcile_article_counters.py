@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from apps.articles.models import Article, ArticleBookmark, ArticleLike
+
+
+def _row_count(model):
+    rows = model.objects.filter(article=OuterRef('pk')).order_by().values('article').annotate(total=Count('id'))
+    return Coalesce(Subquery(rows.values('total')), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Recount likes_count and bookmarks_count for articles whose counters have drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drifted articles')
+
+    def handle(self, *args, **options):
+        drifted = list(
+            Article.objects.annotate(
+                actual_likes=_row_count(ArticleLike),
+                actual_bookmarks=_row_count(ArticleBookmark),
+            ).filter(
+                ~Q(likes_count=F('actual_likes')) | ~Q(bookmarks_count=F('actual_bookmarks'))
+            ).values_list('id', 'slug', 'likes_count', 'actual_likes', 'bookmarks_count', 'actual_bookmarks')
+        )
+
+        for pk, slug, likes, actual_likes, bookmarks, actual_bookmarks in drifted:
+            self.stdout.write(
+                f'  {slug}: likes {likes} -> {actual_likes}, bookmarks {bookmarks} -> {actual_bookmarks}'
+            )
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(drifted)} articles have drifted counters.')
+            return
+
+        ids = [row[0] for row in drifted]
+        for start in range(0, len(ids), 500):
+            with transaction.atomic():
+                # Recount in the UPDATE itself rather than trusting the numbers read above
+                Article.objects.filter(id__in=ids[start:start + 500]).update(
+                    likes_count=_row_count(ArticleLike),
+                    bookmarks_count=_row_count(ArticleBookmark),
+                )
+        self.stdout.write(self.style.SUCCESS(f'Reconciled counters for {len(drifted)} articles.'))
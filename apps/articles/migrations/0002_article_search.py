@@ -0,0 +1,67 @@
+from django.db import migrations
+
+FTS_TABLE = 'articles_search_fts'
+VECTOR_TABLE = 'articles_search_vector'
+POSTGRES_CONFIG = 'english'
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                # Without FTS5 search falls back to icontains
+                return
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"title, excerpt, content, tags, tokenize='porter unicode61 remove_diacritics 2')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE TABLE {VECTOR_TABLE} ('
+            f'article_id bigint PRIMARY KEY REFERENCES articles_article (id) ON DELETE CASCADE, '
+            f'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(f'CREATE INDEX {VECTOR_TABLE}_gin ON {VECTOR_TABLE} USING gin (document)')
+    else:
+        return
+
+    Article = apps.get_model('articles', 'Article')
+    rows = Article.objects.values_list('id', 'title', 'excerpt', 'content', 'tags')
+    with schema_editor.connection.cursor() as cursor:
+        for pk, title, excerpt, content, tags in rows.iterator(chunk_size=500):
+            tags = ' '.join(tag.strip() for tag in tags.split(',') if tag.strip())
+            if vendor == 'sqlite':
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE}(rowid, title, excerpt, content, tags) VALUES (%s, %s, %s, %s, %s)',
+                    [pk, title, excerpt, content, tags],
+                )
+            else:
+                cursor.execute(
+                    f'INSERT INTO {VECTOR_TABLE} (article_id, document) VALUES (%s, '
+                    f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'A') || "
+                    f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'B') || "
+                    f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'C') || "
+                    f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'D'))",
+                    [pk, title, tags, excerpt, content],
+                )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {VECTOR_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils.text import slugify
+
+
+def backfill_tags(apps, schema_editor):
+    Article = apps.get_model('articles', 'Article')
+    ArticleTag = apps.get_model('articles', 'ArticleTag')
+    Tag = apps.get_model('articles', 'Tag')
+
+    links = {}
+    names = {}
+    for pk, tags in Article.objects.exclude(tags='').values_list('id', 'tags').iterator(chunk_size=1000):
+        for name in tags.split(','):
+            name = name.strip()[:50]
+            slug = slugify(name, allow_unicode=True)[:60]
+            if slug:
+                names.setdefault(slug, name)
+                links.setdefault(pk, set()).add(slug)
+
+    Tag.objects.bulk_create([Tag(slug=slug, name=name) for slug, name in names.items()], batch_size=500)
+    tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+    ArticleTag.objects.bulk_create(
+        [ArticleTag(article_id=pk, tag_id=tag_ids[slug]) for pk, slugs in links.items() for slug in slugs],
+        batch_size=500,
+    )
+
+    counts = (
+        ArticleTag.objects.filter(article__status='published')
+        .values('tag').annotate(total=Count('article')).values_list('tag', 'total')
+    )
+    tags = [Tag(id=tag_id, article_count=total) for tag_id, total in counts]
+    Tag.objects.bulk_update(tags, ['article_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0002_article_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('slug', models.SlugField(allow_unicode=True, max_length=60, unique=True)),
+                ('article_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['-article_count', 'name'], name='article_tag_cloud_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArticleTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='article_tags', to='articles.article')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='article_tags', to='articles.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, related_name='articles', through='articles.ArticleTag', to='articles.tag'),
+        ),
+        migrations.AddIndex(
+            model_name='articletag',
+            index=models.Index(fields=['tag', 'article'], name='article_tag_by_tag_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='articletag',
+            unique_together={('article', 'tag')},
+        ),
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
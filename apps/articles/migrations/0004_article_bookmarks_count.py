@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_bookmarks_count(apps, schema_editor):
+    Article = apps.get_model('articles', 'Article')
+    ArticleBookmark = apps.get_model('articles', 'ArticleBookmark')
+    bookmarks = (
+        ArticleBookmark.objects.filter(article=OuterRef('pk'))
+        .order_by().values('article').annotate(total=Count('id')).values('total')
+    )
+    Article.objects.update(bookmarks_count=Coalesce(Subquery(bookmarks), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0003_article_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='bookmarks_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_bookmarks_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0004_article_bookmarks_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleSearchIndex',
+            fields=[
+                ('article', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='articles.article')),
+            ],
+            options={
+                'db_table': 'articles_search_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArticleSearchVector',
+            fields=[
+                ('article', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_vector', serialize=False, to='articles.article')),
+                ('document', models.TextField()),
+            ],
+            options={
+                'db_table': 'articles_search_vector',
+                'managed': False,
+            },
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils.text import slugify
+from apps.accounts.profiles import profile_for
 
 
 class ArticleCategory(models.Model):
@@ -43,9 +44,12 @@ class Article(models.Model):
     is_featured = models.BooleanField(default=False)
     is_doctor_verified = models.BooleanField(default=False)
     tags = models.CharField(max_length=200, blank=True, help_text="Comma-separated tags")
+    # Normalized copy of tags, kept in step by signals (see tags.py)
+    tag_set = models.ManyToManyField('Tag', through='ArticleTag', related_name='articles', blank=True)
     read_time_minutes = models.PositiveIntegerField(default=5, help_text="Estimated read time in minutes")
     views_count = models.PositiveIntegerField(default=0)
     likes_count = models.PositiveIntegerField(default=0)
+    bookmarks_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     published_at = models.DateTimeField(null=True, blank=True)
@@ -59,20 +63,85 @@ class Article(models.Model):
     def get_absolute_url(self):
         return reverse('articles:detail', kwargs={'slug': self.slug})
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_slug = instance.__dict__.get('slug')
+        return instance
+    
+    def loaded_slug(self):
+        """The slug as last loaded from or saved to the database, or None if unsaved"""
+        return getattr(self, '_loaded_slug', None)
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
         
         # Auto-verify if author is a doctor
-        if hasattr(self.author, 'userprofile') and self.author.userprofile.role == 'doctor':
+        # profile_for reuses the profile already loaded with request.user
+        author_profile = profile_for(self.author)
+        if author_profile is not None and author_profile.role == 'doctor':
             self.is_doctor_verified = True
         
         super().save(*args, **kwargs)
+        # Refreshed after post_save, so signal receivers still see the old slug
+        self._loaded_slug = self.slug
     
     @property
     def tag_list(self):
         """Return tags as a list"""
+        # Use prefetched tags when a listing loaded them with prefetch_related('tag_set')
+        if 'tag_set' in getattr(self, '_prefetched_objects_cache', {}):
+            return [tag.name for tag in self.tag_set.all()]
         return [tag.strip() for tag in self.tags.split(',') if tag.strip()]
+    
+    def related_articles(self, limit=4):
+        """Published articles sharing the most tags with this one"""
+        shared = (
+            ArticleTag.objects
+            .filter(tag__in=self.article_tags.values('tag'), article__status='published')
+            .exclude(article=self)
+            .values('article')
+            .annotate(shared_tags=models.Count('tag'))
+            .order_by('-shared_tags', '-article')
+        )
+        ids = [row['article'] for row in shared[:limit]]
+        articles = Article.objects.in_bulk(ids)
+        return [articles[pk] for pk in ids if pk in articles]
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=50)
+    slug = models.SlugField(max_length=60, unique=True, allow_unicode=True)
+    # Published articles with this tag, kept up to date for the tag cloud
+    article_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['-article_count', 'name'], name='article_tag_cloud_idx'),
+        ]
+    
+    def __str__(self):
+        return self.name
+    
+    def get_absolute_url(self):
+        return reverse('articles:by_tag', kwargs={'tag_slug': self.slug})
+
+
+class ArticleTag(models.Model):
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='article_tags')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='article_tags')
+    
+    class Meta:
+        unique_together = ['article', 'tag']
+        indexes = [
+            # Tag pages and related-article lookups start from the tag
+            models.Index(fields=['tag', 'article'], name='article_tag_by_tag_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.article.title} tagged {self.tag.name}"
 
 
 class ArticleLike(models.Model):
@@ -131,3 +200,27 @@ class ArticleView(models.Model):
     
     def __str__(self):
         return f"View of {self.article.title} at {self.created_at}"
+
+
+class ArticleSearchIndex(models.Model):
+    """The SQLite FTS5 table created by migration 0002, mapped so searches can join it"""
+    article = models.OneToOneField(
+        Article, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='search_index'
+    )
+    
+    class Meta:
+        managed = False
+        db_table = 'articles_search_fts'
+
+
+class ArticleSearchVector(models.Model):
+    """The PostgreSQL tsvector table created by migration 0002, mapped so searches can join it"""
+    article = models.OneToOneField(
+        Article, on_delete=models.DO_NOTHING, primary_key=True, db_constraint=False, related_name='search_vector'
+    )
+    document = models.TextField()
+    
+    class Meta:
+        managed = False
+        db_table = 'articles_search_vector'
@@ -0,0 +1,56 @@
+"""
+Like and bookmark toggles.
+
+A toggle deletes the user's row if there is one and creates it otherwise,
+then moves the article's denormalized counter by exactly the number of
+rows that changed, all in one transaction. The counter is never recounted
+on the request path; reconcile_article_counters repairs any drift.
+
+The counter is moved with a single F() UPDATE, floored at zero, and read
+back inside the same transaction, whose write lock keeps other toggles
+from changing it in between.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .models import Article, ArticleBookmark, ArticleLike
+
+# Reaction model -> the Article counter it feeds
+COUNTER_FIELDS = {
+    ArticleLike: 'likes_count',
+    ArticleBookmark: 'bookmarks_count',
+}
+
+
+def adjust_counter(article_id, field, delta):
+    """Add `delta` to an article counter, never going below zero, and return the new value"""
+    articles = Article.objects.filter(pk=article_id)
+    with transaction.atomic(using=articles.db):
+        articles.update(**{field: Greatest(F(field) + delta, Value(0))})
+        return articles.values_list(field, flat=True).first() or 0
+
+
+def toggle(model, article_id, user):
+    """Flip the user's like or bookmark on an article; returns (now active, new counter value)"""
+    field = COUNTER_FIELDS[model]
+    with transaction.atomic():
+        removed, _ = model.objects.filter(article_id=article_id, user=user).delete()
+        if removed:
+            return False, adjust_counter(article_id, field, -removed)
+        try:
+            # A savepoint, so a concurrent duplicate does not break the outer transaction
+            with transaction.atomic():
+                model.objects.create(article_id=article_id, user=user)
+        except IntegrityError:
+            # Another request by the same user created it first and already counted it
+            return True, Article.objects.filter(id=article_id).values_list(field, flat=True).first() or 0
+        return True, adjust_counter(article_id, field, 1)
+
+
+def toggle_like(article_id, user):
+    return toggle(ArticleLike, article_id, user)
+
+
+def toggle_bookmark(article_id, user):
+    return toggle(ArticleBookmark, article_id, user)
@@ -0,0 +1,257 @@
+"""
+Full-text search over articles.
+
+Each article's title, excerpt, content and tags are copied into a search
+index by signals when the article is saved, and removed when it is
+deleted. The index and the query depend on the database:
+
+* SQLite: an FTS5 table (created by migration 0002) ranked with bm25(),
+  title and tag matches weighing most.
+* PostgreSQL: a table of weighted tsvectors with a GIN index, ranked with
+  ts_rank_cd() and excerpted with ts_headline().
+* Anything else, or SQLite built without FTS5: the old icontains filter,
+  newest first.
+
+search() narrows a queryset to the matches and annotates them with
+search_rank and search_snippet, best match first. The index tables are
+mapped by unmanaged models (ArticleSearchIndex, ArticleSearchVector) and
+inner-joined to the articles, so the full-text query runs once for all
+rows. Snippets mark the matched words with HIGHLIGHT_START/HIGHLIGHT_END;
+snippet_html() turns them into escaped HTML with <mark> tags.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, Case, F, FloatField, Func, Q, TextField, Value, When
+from django.db.models.functions import Concat, Greatest, Length, Lower, StrIndex, Substr
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+FTS_TABLE = 'articles_search_fts'
+VECTOR_TABLE = 'articles_search_vector'
+
+# Column weights for bm25(): title, excerpt, content, tags
+BM25_WEIGHTS = (10.0, 4.0, 1.0, 6.0)
+
+POSTGRES_CONFIG = 'english'
+
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+SNIPPET_WORDS = 24
+
+# Characters kept either side of the match in substring search snippets
+SNIPPET_CHARS = 100
+
+_backend = None
+
+
+def document(article):
+    """The text an article is indexed under"""
+    return {
+        'title': article.title,
+        'excerpt': article.excerpt,
+        'content': article.content,
+        'tags': ' '.join(article.tag_list),
+    }
+
+
+def snippet_html(snippet):
+    """Escape a search snippet and turn its highlight markers into <mark> tags"""
+    html = escape(snippet or '')
+    return mark_safe(html.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
+
+
+class SearchBackend:
+    def index(self, articles):
+        """Add or refresh the index entries of these Article instances"""
+
+    def remove(self, article_ids):
+        """Drop the index entries of these article ids"""
+
+    def search(self, articles, query):
+        """Matches for `query` in the `articles` queryset, ranked and with snippets"""
+        raise NotImplementedError
+
+
+class FTSFunction(Func):
+    """
+    An FTS5 function or operator over the index table joined to the articles.
+
+    The first argument is a column of the joined index, e.g.
+    F('search_index__article'). FTS5 takes the table itself in that place, so
+    it is replaced by the table's alias as %(table)s in the template.
+    """
+
+    def as_sql(self, compiler, connection, **extra_context):
+        column, *arguments = self.get_source_expressions()
+        sql_parts, params = [], []
+        for argument in arguments:
+            sql, argument_params = compiler.compile(argument)
+            sql_parts.append(sql)
+            params.extend(argument_params)
+        table = compiler.quote_name_unless_alias(column.alias)
+        return self.template % {'table': table, 'expressions': ', '.join(sql_parts)}, params
+
+
+class FTSMatch(FTSFunction):
+    template = '%(table)s MATCH %(expressions)s'
+    output_field = BooleanField()
+
+
+class BM25(FTSFunction):
+    # bm25() is negative; lower is a better match
+    template = '-bm25(%(table)s, %(expressions)s)'
+    output_field = FloatField()
+
+
+class FTSSnippet(FTSFunction):
+    template = 'snippet(%(table)s, -1, %(expressions)s)'
+    output_field = TextField()
+
+
+class WebSearchQuery(Func):
+    template = f"websearch_to_tsquery('{POSTGRES_CONFIG}', %(expressions)s)"
+
+
+class TSMatch(Func):
+    template = '%(expressions)s'
+    arg_joiner = ' @@ '
+    output_field = BooleanField()
+
+
+class TSRankCD(Func):
+    function = 'ts_rank_cd'
+    output_field = FloatField()
+
+
+class TSHeadline(Func):
+    template = f"ts_headline('{POSTGRES_CONFIG}', %(expressions)s)"
+    output_field = TextField()
+
+
+class LikeSearchBackend(SearchBackend):
+    """Unindexed substring search, used when no full-text index is available"""
+
+    def search(self, articles, query):
+        # Lower() and icontains agree on ASCII case, which is all SQLite folds
+        position = StrIndex(Lower('content'), Value(query.lower()))
+        start = Greatest(F('match_position') - SNIPPET_CHARS, Value(1))
+        end = F('match_position') + len(query)
+        snippet = Concat(
+            Case(When(match_position__gt=SNIPPET_CHARS + 1, then=Value('…')), default=Value('')),
+            Substr('content', start, F('match_position') - start),
+            Value(HIGHLIGHT_START),
+            Substr('content', F('match_position'), len(query)),
+            Value(HIGHLIGHT_END),
+            Substr('content', end, SNIPPET_CHARS),
+            Case(When(content_length__gte=end + SNIPPET_CHARS, then=Value('…')), default=Value('')),
+            output_field=TextField(),
+        )
+        return articles.filter(
+            Q(title__icontains=query) | Q(content__icontains=query) | Q(tags__icontains=query)
+        ).alias(
+            match_position=position,
+            content_length=Length('content'),
+        ).annotate(
+            search_rank=Value(0.0),
+            # An excerpt around the first match in the content, or the summary for title and tag matches
+            search_snippet=Case(When(match_position__gt=0, then=snippet), default=F('excerpt')),
+        )
+
+
+class SQLiteSearchBackend(SearchBackend):
+    def index(self, articles):
+        rows = [(article.pk, *document(article).values()) for article in articles]
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE}(rowid, title, excerpt, content, tags) VALUES (%s, %s, %s, %s, %s)', rows
+            )
+
+    def remove(self, article_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in article_ids])
+
+    @staticmethod
+    def match_expression(query):
+        """An FTS5 query requiring a prefix match on every word"""
+        terms = re.findall(r'\w+', query.lower())
+        return ' AND '.join('"%s"*' % term for term in terms)
+
+    def search(self, articles, query):
+        match = self.match_expression(query)
+        if not match:
+            return articles.none()
+        index = F('search_index__article')
+        # The inner join lets FTS5 drive the query from MATCH, evaluating it once for all rows
+        return articles.filter(FTSMatch(index, Value(match)), search_index__isnull=False).annotate(
+            search_rank=BM25(index, *[Value(weight) for weight in BM25_WEIGHTS]),
+            search_snippet=FTSSnippet(
+                index, Value(HIGHLIGHT_START), Value(HIGHLIGHT_END), Value('…'), Value(SNIPPET_WORDS)
+            ),
+        ).order_by('-search_rank', '-published_at')
+
+
+class PostgresSearchBackend(SearchBackend):
+    def index(self, articles):
+        rows = []
+        for article in articles:
+            text = document(article)
+            rows.append((article.pk, text['title'], text['tags'], text['excerpt'], text['content']))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {VECTOR_TABLE} (article_id, document) VALUES (%s, '
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'A') || "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'B') || "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'C') || "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'D')) "
+                f'ON CONFLICT (article_id) DO UPDATE SET document = EXCLUDED.document',
+                rows,
+            )
+
+    def remove(self, article_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {VECTOR_TABLE} WHERE article_id = ANY(%s)', [list(article_ids)])
+
+    def search(self, articles, query):
+        if not re.search(r'\w', query):
+            return articles.none()
+        document = F('search_vector__document')
+        return articles.filter(TSMatch(document, WebSearchQuery(Value(query))), search_vector__isnull=False).annotate(
+            search_rank=TSRankCD(document, WebSearchQuery(Value(query))),
+            search_snippet=TSHeadline(
+                'content', WebSearchQuery(Value(query)),
+                Value(f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=35, MinWords=15'),
+            ),
+        ).order_by('-search_rank', '-published_at')
+
+
+def _index_exists(table):
+    with connection.cursor() as cursor:
+        return table in connection.introspection.table_names(cursor)
+
+
+def get_search_backend():
+    """The backend for the default database; picked once per process"""
+    global _backend
+    if _backend is None:
+        if connection.vendor == 'sqlite' and _index_exists(FTS_TABLE):
+            _backend = SQLiteSearchBackend()
+        elif connection.vendor == 'postgresql' and _index_exists(VECTOR_TABLE):
+            _backend = PostgresSearchBackend()
+        else:
+            _backend = LikeSearchBackend()
+    return _backend
+
+
+def index_articles(articles):
+    get_search_backend().index(list(articles))
+
+
+def remove_articles(article_ids):
+    get_search_backend().remove(list(article_ids))
+
+
+def search(articles, query):
+    return get_search_backend().search(articles, query)
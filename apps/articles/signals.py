@@ -0,0 +1,70 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import caching, search, tags
+from .models import Article, ArticleCategory, ArticleComment, ArticleTag
+
+# Fields that feed an article's search document
+SEARCH_FIELDS = {'title', 'excerpt', 'content', 'tags'}
+
+# Fields that decide which tags an article counts towards
+TAG_FIELDS = {'tags', 'status'}
+
+# Counters that may show slightly stale values on cached pages
+COUNTER_FIELDS = {'views_count', 'likes_count', 'bookmarks_count'}
+
+
+@receiver(post_save, sender=Article)
+def update_search_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not SEARCH_FIELDS & set(update_fields)):
+        return
+    search.index_articles([instance])
+
+
+@receiver(post_delete, sender=Article)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_articles([instance.pk])
+
+
+@receiver(post_save, sender=Article)
+def update_tags(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not TAG_FIELDS & set(update_fields)):
+        return
+    tags.refresh_tag_counts(tags.sync_article_tags(instance))
+
+
+@receiver(pre_delete, sender=Article)
+def remember_tags(sender, instance, **kwargs):
+    # The ArticleTag rows are gone by post_delete
+    instance._deleted_tag_ids = list(ArticleTag.objects.filter(article=instance).values_list('tag_id', flat=True))
+
+
+@receiver(post_delete, sender=Article)
+def update_tag_counts_on_delete(sender, instance, **kwargs):
+    tag_ids = getattr(instance, '_deleted_tag_ids', None)
+    if tag_ids:
+        tags.refresh_tag_counts(tag_ids)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def invalidate_article_pages(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= COUNTER_FIELDS:
+        return
+    caching.invalidate_article(instance.slug)
+    # A renamed article's page is also cached under its old slug
+    loaded_slug = instance.loaded_slug()
+    if loaded_slug and loaded_slug != instance.slug:
+        caching.invalidate_article(loaded_slug)
+
+
+@receiver(post_save, sender=ArticleComment)
+@receiver(post_delete, sender=ArticleComment)
+def invalidate_comment_fragment(sender, instance, **kwargs):
+    caching.invalidate_comments(instance.article_id)
+
+
+@receiver(post_save, sender=ArticleCategory)
+@receiver(post_delete, sender=ArticleCategory)
+def invalidate_article_lists(sender, instance, **kwargs):
+    caching.invalidate_lists()
@@ -0,0 +1,63 @@
+"""
+Normalized article tags.
+
+Article.tags stays the comma-separated field authors edit. Saving an
+article mirrors it into Tag rows linked through ArticleTag, so tag pages
+and related-article lookups are indexed joins instead of substring scans.
+Tag.article_count holds the number of published articles per tag and is
+recounted for the affected tags whenever an article's tags or status
+change, which keeps the tag cloud a plain ordered read.
+"""
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils.text import slugify
+
+from .models import ArticleTag, Tag
+
+
+def parse_tags(text):
+    """{slug: name} for a comma-separated tag string, first spelling wins"""
+    tags = {}
+    for name in text.split(','):
+        name = name.strip()[:50]
+        slug = slugify(name, allow_unicode=True)[:60]
+        if slug and slug not in tags:
+            tags[slug] = name
+    return tags
+
+
+def get_or_create_tags(tags):
+    """Tag ids for {slug: name}, creating the missing tags"""
+    Tag.objects.bulk_create([Tag(slug=slug, name=name) for slug, name in tags.items()], ignore_conflicts=True)
+    return dict(Tag.objects.filter(slug__in=tags).values_list('slug', 'id'))
+
+
+def sync_article_tags(article):
+    """Make the article's ArticleTag rows match its tags string; returns the ids of tags whose count may change"""
+    wanted = set(get_or_create_tags(parse_tags(article.tags)).values()) if article.tags else set()
+    current = set(ArticleTag.objects.filter(article=article).values_list('tag_id', flat=True))
+    if current - wanted:
+        ArticleTag.objects.filter(article=article, tag_id__in=current - wanted).delete()
+    if wanted - current:
+        ArticleTag.objects.bulk_create(
+            [ArticleTag(article=article, tag_id=tag_id) for tag_id in wanted - current], ignore_conflicts=True
+        )
+    return current | wanted
+
+
+def refresh_tag_counts(tag_ids=None):
+    """Recount published articles for the given tags, or for every tag"""
+    published = (
+        ArticleTag.objects.filter(tag=OuterRef('pk'), article__status='published')
+        .order_by()
+        .values('tag')
+        .annotate(total=Count('article'))
+        .values('total')
+    )
+    tags = Tag.objects.all() if tag_ids is None else Tag.objects.filter(id__in=tag_ids)
+    tags.update(article_count=Coalesce(Subquery(published), Value(0)))
+
+
+def tag_cloud(limit=30):
+    """The most used tags with published articles"""
+    return Tag.objects.filter(article_count__gt=0).order_by('-article_count', 'name')[:limit]
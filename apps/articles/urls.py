@@ -7,6 +7,7 @@ urlpatterns = [
     path('', views.article_list, name='list'),
     path('create/', views.article_create, name='create'),
     path('category/<slug:category_slug>/', views.article_by_category, name='by_category'),
+    path('tag/<str:tag_slug>/', views.article_by_tag, name='by_tag'),
     path('<slug:slug>/', views.article_detail, name='detail'),
     path('<slug:slug>/update/', views.article_update, name='update'),
     path('<slug:slug>/delete/', views.article_delete, name='delete'),
@@ -1,52 +1,78 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.core.paginator import Paginator
-from django.db.models import Q
-from .models import Article, ArticleCategory, ArticleLike, ArticleBookmark, ArticleComment
+from . import caching, reactions, search, tags
+from .counters import pending_views, record_view
+from .models import Article, ArticleCategory, ArticleLike, ArticleBookmark, ArticleComment, Tag
 
 
+@caching.cache_list_page
 def article_list(request):
-    articles = Article.objects.filter(status='published').order_by('-published_at')
+    articles = Article.objects.filter(status='published').select_related('category', 'author').order_by('-published_at')
     categories = ArticleCategory.objects.filter(is_active=True)
     
-    # Search functionality
+    # Search functionality, ranked best match first by the search index
     search_query = request.GET.get('search')
     if search_query:
-        articles = articles.filter(
-            Q(title__icontains=search_query) |
-            Q(content__icontains=search_query) |
-            Q(tags__icontains=search_query)
-        )
+        articles = search.search(articles, search_query)
     
     # Category filter
     category_slug = request.GET.get('category')
     if category_slug:
         articles = articles.filter(category__slug=category_slug)
     
+    # Tag filter, an indexed join through ArticleTag
+    tag_slug = request.GET.get('tag')
+    if tag_slug:
+        articles = articles.filter(article_tags__tag__slug=tag_slug)
+    
     # Pagination
     paginator = Paginator(articles, 12)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    if search_query:
+        for article in page_obj:
+            article.search_snippet = search.snippet_html(article.search_snippet)
     
     return render(request, 'articles/list.html', {
+        'articles': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
         'page_obj': page_obj,
         'categories': categories,
         'search_query': search_query,
         'category_slug': category_slug,
+        'tag_slug': tag_slug,
+        'tag_cloud': tags.tag_cloud(),
     })
 
 
 def article_detail(request, slug):
-    article = get_object_or_404(Article, slug=slug, status='published')
+    # Anonymous readers are served from the page cache while the article is unchanged
+    page_key = None
+    if caching.is_cacheable(request):
+        version = caching.article_version(slug)
+        if version is not None:
+            article_id, token = version
+            page_key = caching.page_key(f'detail:{slug}', token, request)
+            response = caching.cached_response(request, page_key)
+            if response is not None:
+                record_view(article_id, request)
+                return response
     
-    # Increment view count
-    article.views_count += 1
-    article.save(update_fields=['views_count'])
+    article = get_object_or_404(Article.objects.select_related('category', 'author'), slug=slug, status='published')
     
-    # Get comments
-    comments = ArticleComment.objects.filter(article=article, is_approved=True, parent=None)
+    # Counted in memory and added to views_count in batches, see counters.py
+    record_view(article.pk, request)
+    article.views_count += pending_views(article.pk)
+    
+    # Get comments; only evaluated when the comment fragment is not cached
+    comments = (
+        ArticleComment.objects.filter(article=article, is_approved=True, parent=None)
+        .select_related('author')
+        .prefetch_related('replies__author')
+    )
     
     # Check if user has liked or bookmarked
     user_liked = False
@@ -55,12 +81,18 @@ def article_detail(request, slug):
         user_liked = ArticleLike.objects.filter(article=article, user=request.user).exists()
         user_bookmarked = ArticleBookmark.objects.filter(article=article, user=request.user).exists()
     
-    return render(request, 'articles/detail.html', {
+    response = render(request, 'articles/detail.html', {
         'article': article,
         'comments': comments,
+        'comments_version': caching.comments_version(article.pk),
+        'fragment_timeout': caching.page_timeout(),
+        'related_articles': article.related_articles(),
         'user_liked': user_liked,
         'user_bookmarked': user_bookmarked,
     })
+    if page_key is not None:
+        caching.store_response(page_key, response)
+    return response
 
 
 @login_required
@@ -99,23 +131,39 @@ def article_by_category(request, category_slug):
     })
 
 
+@caching.cache_list_page
+def article_by_tag(request, tag_slug):
+    tag = get_object_or_404(Tag, slug=tag_slug)
+    articles = (
+        Article.objects.filter(article_tags__tag=tag, status='published')
+        .select_related('category', 'author')
+        .order_by('-published_at')
+    )
+    
+    # Pagination
+    paginator = Paginator(articles, 12)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+    
+    return render(request, 'articles/list.html', {
+        'articles': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+        'page_obj': page_obj,
+        'categories': ArticleCategory.objects.filter(is_active=True),
+        'tag': tag,
+        'tag_slug': tag.slug,
+        'tag_cloud': tags.tag_cloud(),
+    })
+
+
 @login_required
 def article_like(request, slug):
     if request.method == 'POST':
-        article = get_object_or_404(Article, slug=slug)
-        like, created = ArticleLike.objects.get_or_create(article=article, user=request.user)
-        
-        if not created:
-            like.delete()
-            liked = False
-        else:
-            liked = True
-        
-        # Update like count
-        article.likes_count = ArticleLike.objects.filter(article=article).count()
-        article.save(update_fields=['likes_count'])
-        
-        return JsonResponse({'liked': liked, 'likes_count': article.likes_count})
+        article_id = Article.objects.filter(slug=slug).values_list('id', flat=True).first()
+        if article_id is None:
+            raise Http404('No article matches the given query.')
+        liked, likes_count = reactions.toggle_like(article_id, request.user)
+        return JsonResponse({'liked': liked, 'likes_count': likes_count})
     
     return JsonResponse({'error': 'Invalid request'})
 
@@ -123,16 +171,11 @@ def article_like(request, slug):
 @login_required
 def article_bookmark(request, slug):
     if request.method == 'POST':
-        article = get_object_or_404(Article, slug=slug)
-        bookmark, created = ArticleBookmark.objects.get_or_create(article=article, user=request.user)
-        
-        if not created:
-            bookmark.delete()
-            bookmarked = False
-        else:
-            bookmarked = True
-        
-        return JsonResponse({'bookmarked': bookmarked})
+        article_id = Article.objects.filter(slug=slug).values_list('id', flat=True).first()
+        if article_id is None:
+            raise Http404('No article matches the given query.')
+        bookmarked, bookmarks_count = reactions.toggle_bookmark(article_id, request.user)
+        return JsonResponse({'bookmarked': bookmarked, 'bookmarks_count': bookmarks_count})
     
     return JsonResponse({'error': 'Invalid request'})
 
@@ -6,12 +6,13 @@ from django.core.paginator import Paginator
 from django.http import JsonResponse
 from .models import Baby, GrowthRecord, FeedingRecord, SleepRecord, DiaperRecord, VaccinationRecord, BabyMilestoneRecord
 from .forms import BabyForm, GrowthRecordForm, FeedingRecordForm, SleepRecordForm, DiaperRecordForm, VaccinationRecordForm, BabyMilestoneRecordForm
-from apps.accounts.models import UserProfile, Notification
+from apps.accounts import notifications
+from apps.accounts.profiles import get_user_profile
 
 
 @login_required
 def baby_list(request):
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     # Only mothers can access baby tracker
     if user_profile.role != 'mother':
@@ -28,7 +29,7 @@ def baby_list(request):
 
 @login_required
 def baby_create(request):
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     if user_profile.role != 'mother':
         messages.error(request, 'Only mothers can add babies.')
@@ -42,7 +43,7 @@ def baby_create(request):
             baby.save()
             
             # Create notification
-            Notification.objects.create(
+            notifications.notify(
                 user=request.user,
                 title='Baby Profile Created',
                 message=f"Welcome {baby.name}! Baby profile has been created successfully.",
@@ -6,13 +6,14 @@ from django.core.paginator import Paginator
 from django.utils import timezone
 from .models import PregnancyLog, PregnancyWeeklyLog, PregnancyMilestone, PregnancyReminder, PregnancyTip
 from .forms import PregnancyLogForm, PregnancyWeeklyLogForm, PregnancyMilestoneForm, PregnancyReminderForm
-from apps.accounts.models import UserProfile, Notification
+from apps.accounts import notifications
+from apps.accounts.profiles import get_user_profile
 from apps.appointments.models import Appointment
 
 
 @login_required
 def pregnancy_dashboard(request):
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     # Only mothers can access pregnancy tracker
     if user_profile.role != 'mother':
@@ -65,7 +66,7 @@ def pregnancy_dashboard(request):
 
 @login_required
 def pregnancy_list(request):
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     if user_profile.role != 'mother':
         messages.error(request, 'Only mothers can access pregnancy records.')
@@ -81,7 +82,7 @@ def pregnancy_list(request):
 
 @login_required
 def pregnancy_create(request):
-    user_profile = get_object_or_404(UserProfile, user=request.user)
+    user_profile = get_user_profile(request)
     
     if user_profile.role != 'mother':
         messages.error(request, 'Only mothers can create pregnancy records.')
@@ -101,7 +102,7 @@ def pregnancy_create(request):
             pregnancy.save()
             
             # Create notification
-            Notification.objects.create(
+            notifications.notify(
                 user=request.user,
                 title='Pregnancy Tracker Started',
                 message=f'Your pregnancy journey has been started! Due date: {pregnancy.due_date}',
@@ -0,0 +1,197 @@
+"""
+On-demand thumbnails for uploaded photos.
+
+Article images are public. Baby, milestone and pregnancy photos are only
+served to the signed-in user who owns them, with private cache headers.
+
+A thumbnail is named by a preset (see PRESETS) and the media path of the
+original. It is rendered on first request and kept in a disk cache whose
+file names hash the path, the original's modification time, the preset and
+the output format, so replacing an upload makes its old thumbnails
+unreachable instead of stale.
+
+The cache is bounded by THUMBNAIL_CACHE_MAX_BYTES. Reading a cached file
+refreshes its modification time, and when a new file pushes the total over
+the limit the least recently used files are deleted.
+"""
+import hashlib
+import io
+import os
+import posixpath
+import tempfile
+import threading
+import time as clock
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# name: (width, height, crop). Cropped presets fill the box exactly, the rest fit inside it.
+PRESETS = {
+    'avatar': (192, 192, True),
+    'card': (800, 384, True),
+    'medium': (1200, 1200, False),
+}
+
+# Upload directories whose thumbnails anyone may see
+PUBLIC_SOURCE_DIRS = ('article_images/',)
+
+# Upload directories of personal photos: (app label, model, image field, lookup to the owning user)
+PRIVATE_SOURCE_DIRS = {
+    'baby_photos/': ('babytracker', 'Baby', 'photo', 'parent'),
+    'milestone_photos/': ('babytracker', 'BabyMilestoneRecord', 'photo', 'baby__parent'),
+    'pregnancy_photos/': ('pregnancy', 'PregnancyWeeklyLog', 'photo', 'pregnancy__user'),
+}
+
+# Anything else in MEDIA_ROOT is off limits
+SOURCE_DIRS = PUBLIC_SOURCE_DIRS + tuple(PRIVATE_SOURCE_DIRS)
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+QUALITY = 80
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# A cached file used within this many seconds is not touched again
+TOUCH_INTERVAL = 3600
+
+_cache_lock = threading.Lock()
+_cache_bytes = None
+
+
+def cache_dir():
+    return str(getattr(settings, 'THUMBNAIL_CACHE_DIR', os.path.join(settings.BASE_DIR, 'thumbnail_cache')))
+
+
+def max_cache_bytes():
+    return getattr(settings, 'THUMBNAIL_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+
+
+def source_path(path):
+    """The normalized media path if thumbnails may be made from it, else None"""
+    path = posixpath.normpath(path)
+    if path.startswith(('/', '..')) or '/../' in path:
+        return None
+    return path if path.startswith(SOURCE_DIRS) else None
+
+
+def is_public(path):
+    return path.startswith(PUBLIC_SOURCE_DIRS)
+
+
+def is_owner(user, path):
+    """Whether a private photo belongs to the user"""
+    for directory, (app_label, model_name, field, owner) in PRIVATE_SOURCE_DIRS.items():
+        if path.startswith(directory):
+            model = apps.get_model(app_label, model_name)
+            return model.objects.filter(**{field: path, owner: user}).exists()
+    return False
+
+
+def cache_key(path, mtime, preset, image_format):
+    return hashlib.sha256(f'{path}\0{mtime}\0{preset}\0{image_format}'.encode()).hexdigest()
+
+
+def cache_path(key, image_format):
+    return os.path.join(cache_dir(), key[:2], f'{key}.{image_format}')
+
+
+def render(data, preset, image_format):
+    """Decode an image once and return the preset's thumbnail as bytes"""
+    width, height, crop = PRESETS[preset]
+    image = Image.open(io.BytesIO(data))
+    # JPEGs can be decoded straight at 1/2, 1/4 or 1/8 scale
+    image.draft('RGB', (width, height))
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') and image_format == 'webp' else 'RGB')
+
+    if crop:
+        scale = max(width / image.width, height / image.height)
+        crop_width, crop_height = width / scale, height / scale
+        left, top = (image.width - crop_width) / 2, (image.height - crop_height) / 2
+        # reducing_gap lets Pillow shrink by whole factors before the final resample
+        image = image.resize(
+            (width, height), Image.Resampling.LANCZOS,
+            box=(left, top, left + crop_width, top + crop_height), reducing_gap=3.0,
+        )
+    else:
+        image.thumbnail((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    output = io.BytesIO()
+    pil_format = FORMATS[image_format][0]
+    if pil_format == 'WEBP':
+        image.save(output, pil_format, quality=QUALITY, method=4)
+    else:
+        image.save(output, pil_format, quality=QUALITY, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def open_thumbnail(path, mtime, preset, image_format):
+    """Open the cached thumbnail for reading, rendering it first if needed"""
+    key = cache_key(path, mtime, preset, image_format)
+    target = cache_path(key, image_format)
+    try:
+        # Opened before anything else so eviction cannot pull it away mid-response
+        cached = open(target, 'rb')
+    except FileNotFoundError:
+        pass
+    else:
+        if clock.time() - os.fstat(cached.fileno()).st_mtime > TOUCH_INTERVAL:
+            os.utime(target)
+        return cached
+
+    with default_storage.open(path, 'rb') as original:
+        content = render(original.read(), preset, image_format)
+
+    # Write beside the target and rename so readers never see a partial file
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+    with os.fdopen(handle, 'wb') as output:
+        output.write(content)
+    os.replace(temporary, target)
+    cached = open(target, 'rb')
+    _record_write(len(content))
+    return cached
+
+
+def _cached_files():
+    for directory, _, names in os.walk(cache_dir()):
+        for name in names:
+            if not name.endswith('.tmp'):
+                yield os.path.join(directory, name)
+
+
+def _record_write(size):
+    global _cache_bytes
+    with _cache_lock:
+        if _cache_bytes is None:
+            _cache_bytes = sum(os.path.getsize(name) for name in _cached_files())
+        else:
+            _cache_bytes += size
+        if _cache_bytes > max_cache_bytes():
+            _cache_bytes = _evict(max_cache_bytes() * 9 // 10)
+
+
+def _evict(target_bytes):
+    """Delete least recently used thumbnails until the cache fits in target_bytes; returns its new size"""
+    files = []
+    for name in _cached_files():
+        try:
+            stat = os.stat(name)
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in files)
+    for _, size, name in sorted(files):
+        if total <= target_bytes:
+            break
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+        total -= size
+    return total
@@ -0,0 +1,16 @@
+from django import template
+from django.urls import reverse
+
+from ..service import is_public
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(image, preset='card'):
+    """URL of a preset-sized copy of an image field, e.g. {{ baby.photo|thumbnail:'avatar' }}"""
+    if not image:
+        return ''
+    # Personal photos go through the view that checks who is asking
+    view = 'thumbnails:thumbnail' if is_public(image.name) else 'thumbnails:private_thumbnail'
+    return reverse(view, args=[preset, image.name])
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'thumbnails'
+
+urlpatterns = [
+    path('private/<slug:preset>/<path:path>', views.private_thumbnail, name='private_thumbnail'),
+    path('<slug:preset>/<path:path>', views.thumbnail, name='thumbnail'),
+]
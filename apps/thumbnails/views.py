@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+from PIL import UnidentifiedImageError
+
+from . import service
+
+
+def _serve(request, preset, path, public):
+    """Preset-sized copy of a source photo, as WebP when the browser accepts it"""
+    try:
+        modified = default_storage.get_modified_time(path)
+    except (FileNotFoundError, NotImplementedError):
+        raise Http404('Image not found')
+    mtime = modified.timestamp()
+
+    image_format = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+    etag = quote_etag(service.cache_key(path, mtime, preset, image_format)[:32])
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(mtime))
+    if response is None:
+        try:
+            thumbnail_file = service.open_thumbnail(path, mtime, preset, image_format)
+        except (FileNotFoundError, UnidentifiedImageError):
+            raise Http404('Image not found')
+        response = FileResponse(thumbnail_file, content_type=service.FORMATS[image_format][1])
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    patch_vary_headers(response, ['Accept'])
+    max_age = getattr(settings, 'THUMBNAIL_MAX_AGE', 86400)
+    if public:
+        patch_cache_control(response, public=True, max_age=max_age)
+    else:
+        # Personal photos must not be kept by shared proxies or CDNs
+        patch_cache_control(response, private=True, max_age=max_age)
+    return response
+
+
+@require_safe
+def thumbnail(request, preset, path):
+    """Thumbnail of a public image such as an article's featured image"""
+    if preset not in service.PRESETS:
+        raise Http404('Unknown thumbnail preset')
+    path = service.source_path(path)
+    if path is None or not service.is_public(path):
+        raise Http404('No thumbnails for this file')
+    return _serve(request, preset, path, public=True)
+
+
+@require_safe
+@login_required
+def private_thumbnail(request, preset, path):
+    """Thumbnail of a personal photo, only for the user it belongs to"""
+    if preset not in service.PRESETS:
+        raise Http404('Unknown thumbnail preset')
+    path = service.source_path(path)
+    if path is None or service.is_public(path) or not service.is_owner(request.user, path):
+        raise Http404('No thumbnails for this file')
+    return _serve(request, preset, path, public=False)
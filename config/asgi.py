@@ -1,5 +1,9 @@
 """
 ASGI config for Baby Moms Care project.
+
+Serve the site through this application (e.g. `uvicorn config.asgi:application`)
+so the live notification stream at /accounts/notifications/stream/ holds
+idle connections on the event loop instead of a thread each.
 """
 
 import os
@@ -8,4 +12,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from apps.accounts.events import with_notification_stream  # noqa: E402
+
+application = with_notification_stream(django_application)
@@ -47,6 +47,7 @@ LOCAL_APPS = [
     'apps.articles',
     'apps.forum',
     'apps.support',
+    'apps.thumbnails',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -60,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.accounts.middleware.NotificationBufferMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -75,6 +77,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'apps.accounts.context_processors.notifications',
             ],
         },
     },
@@ -87,9 +90,37 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts so concurrent
+            # bookings queue instead of racing (see apps/appointments/booking.py)
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
+# Cache
+# Shared by every worker process, so cached counters and article page versions
+# agree across workers. For larger deployments switch to
+# django.core.cache.backends.redis.RedisCache, whose incr() is atomic.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'django_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+# Authentication
+# ProfileModelBackend loads the UserProfile with the user; ModelBackend stays
+# listed so sessions created before it was added remain valid.
+AUTHENTICATION_BACKENDS = [
+    'apps.accounts.backends.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -129,6 +160,35 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CRISPY_ALLOWED_TEMPLATE_PACKS = "tailwind"
 CRISPY_TEMPLATE_PACK = "tailwind"
 
+# Slots one patient may hold at once while booking (see apps/appointments/booking.py)
+SLOT_HOLD_MAX_PER_HOLDER = 3
+
+# Notifications (see apps/accounts/notifications.py)
+NOTIFICATION_BACKEND = 'apps.accounts.notifications.DatabaseBackend'
+NOTIFICATION_BUFFER_SIZE = 100
+# Pub/sub behind the live notification stream (see apps/accounts/events.py)
+NOTIFICATION_EVENT_BROKER = 'apps.accounts.events.DatabaseBroker'
+# Seconds between the DatabaseBroker's checks for new notifications
+NOTIFICATION_EVENT_POLL_INTERVAL = 2
+# Read notifications older than this are moved out by archive_notifications
+NOTIFICATION_RETENTION_DAYS = 90
+
+# Background threads resizing uploaded profile pictures (see apps/accounts/images.py)
+PROFILE_PICTURE_WORKERS = 2
+
+# Resized photos served by apps/thumbnails, kept outside MEDIA_ROOT
+THUMBNAIL_CACHE_DIR = BASE_DIR / 'thumbnail_cache'
+THUMBNAIL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+THUMBNAIL_MAX_AGE = 60 * 60 * 24
+
+# Article views are buffered in memory and written every this many seconds (see apps/articles/counters.py)
+ARTICLE_VIEW_FLUSH_INTERVAL = 30
+# Fraction of article views also logged as ArticleView rows
+ARTICLE_VIEW_SAMPLE_RATE = 0
+# Anonymous article pages are kept in the cache this long and browsers may reuse them for ARTICLE_PAGE_MAX_AGE
+ARTICLE_PAGE_CACHE_TIMEOUT = 600
+ARTICLE_PAGE_MAX_AGE = 60
+
 # Login/Logout URLs
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'accounts:dashboard'
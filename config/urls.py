@@ -17,6 +17,7 @@ urlpatterns = [
     path('articles/', include('apps.articles.urls')),
     path('forum/', include('apps.forum.urls')),
     path('support/', include('apps.support.urls')),
+    path('thumbnails/', include('apps.thumbnails.urls')),
 ]
 
 if settings.DEBUG: